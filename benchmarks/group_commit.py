@@ -0,0 +1,99 @@
+"""Points write throughput: one commit per command vs. group commit.
+
+Simulates a burst of concurrent !addpoints commands against a scratch copy of
+the points schema and prints commands per second for:
+
+  blocking   - the old path: sqlite3 on the event loop, commit per command
+  execute    - Database.execute, one transaction per command on the writer thread
+  batched    - Database.execute_batched, commands group-committed together
+
+Every mode uses the pragmas points.db runs with (WAL, synchronous=FULL), so each
+commit pays for an fsync and the modes differ only in how they commit.
+
+Run from the repository root:  python -m benchmarks.group_commit [commands] [concurrency]
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from cogs.points_items.points_items import MIGRATIONS
+from utils.database import Database
+from utils.migrations import apply_migrations
+
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "FULL"
+UPSERT = "INSERT INTO points (user_id, points) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET points = points + ?"
+
+
+def fresh_database(directory, name):
+    path = os.path.join(directory, name)
+    conn = sqlite3.connect(path, isolation_level=None)
+    apply_migrations(conn, MIGRATIONS)
+    conn.close()
+    return path
+
+
+async def run_commands(command, commands, concurrency):
+    """Run `commands` calls of command(i), at most `concurrency` at a time; returns commands per second"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with limit:
+            await command(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(commands)))
+    return commands / (time.perf_counter() - start)
+
+
+async def bench_blocking(path, commands, concurrency):
+    # Same as the original cog: commit on the event loop
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+
+    async def command(i):
+        conn.execute(UPSERT, (i % 200, 1.0, 1.0))
+        conn.commit()
+        await asyncio.sleep(0)
+
+    try:
+        return await run_commands(command, commands, concurrency)
+    finally:
+        conn.close()
+
+
+async def bench_database(path, commands, concurrency, batched):
+    db = Database(path, synchronous=SYNCHRONOUS)
+
+    async def command(i):
+        if batched:
+            await db.execute_batched(UPSERT, (i % 200, 1.0, 1.0))
+        else:
+            await db.execute(UPSERT, (i % 200, 1.0, 1.0))
+
+    try:
+        return await run_commands(command, commands, concurrency)
+    finally:
+        db.close()
+
+
+async def main(commands, concurrency):
+    with tempfile.TemporaryDirectory() as directory:
+        results = {
+            "blocking": await bench_blocking(fresh_database(directory, "blocking.db"), commands, concurrency),
+            "execute": await bench_database(fresh_database(directory, "execute.db"), commands, concurrency, False),
+            "batched": await bench_database(fresh_database(directory, "batched.db"), commands, concurrency, True),
+        }
+
+    print(f"{commands} commands, {concurrency} concurrent")
+    for name, rate in results.items():
+        print(f"  {name:<9} {rate:>10.0f} commands/s")
+
+
+if __name__ == "__main__":
+    commands = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(commands, concurrency))
@@ -1,96 +1,85 @@
 from discord.ext import commands
-import random
-import time
-import pytz
-from datetime import datetime
+import asyncio
+from utils.cache import LRUCache
+from utils.outbound import outbound
+from utils.ratelimit import TokenBucket
+from cogs.autoresponses.triggers import load_config, load_cooldowns, build_matchers
+
+# Used for anything missing from the "cooldowns" section of data/autoresponses.json.
+# burst is how many responses can go out back to back, refill_seconds how long each one takes to come back.
+DEFAULT_COOLDOWNS = {
+    "channel": {"burst": 3, "refill_seconds": 20},
+    "user": {"burst": 2, "refill_seconds": 30},
+}
+# Cooldowns are tracked for this many recently active channels/users; forgotten ones start fresh
+MAX_BUCKETS = 10000
+# Pause between the messages of a multi-part response (e.g. the backflip)
+SEQUENCE_DELAY = 0.5
 
 class AutoResponses(commands.Cog):
+    """Replies to trigger phrases ("hi reece", "tell me a joke reece", ...).
+
+    Triggers and their responses live in data/autoresponses.json and are
+    compiled once at startup (see triggers.TriggerMatcher), with per-guild
+    overrides under "guilds". Responses are rate limited per channel and per
+    user so spamming triggers can't eat into the bot's REST budget.
+    """
+
     def __init__(self, bot):
         self.bot = bot
-        self.greetings = self.load_greetings()
-        self.facts = self.load_facts()
+        config = load_config("data/autoresponses.json")
+        self.matcher, self.guild_matchers = build_matchers(config, "data")
+        self.cooldowns = load_cooldowns(config, DEFAULT_COOLDOWNS)
+        self.channel_buckets = LRUCache(MAX_BUCKETS)
+        self.user_buckets = LRUCache(MAX_BUCKETS)
         print("AutoResponses cog loaded")
 
-    def load_greetings(self):
-        try:
-            with open("data/greetings.txt", "r", encoding="utf-8") as file:
-                return [line.strip() for line in file if line.strip()]
-        except FileNotFoundError:
-            print("Warning: data/greetings.txt not found. Using default greetings.")
-            return [
-                "hey there, {}!",
-                "hello, {}!",
-                "hi, {} how's it going",
-                "yo, {}"
-            ]
-    
-    def load_facts(self):
-        try:
-            with open("data/funfacts.txt", "r", encoding="utf-8") as file:
-                return [line.strip() for line in file if line.strip()]
-        except FileNotFoundError:
-            print("Warning: data/funfacts.txt not found. Using default facts.")
-            return [
-                "Did you know? Honey never spoils.",
-                "Bananas are berries, but strawberries aren't.",
-                "A group of flamingos is called a 'flamboyance'.",
-                "Octopuses have three hearts."
-            ]
+    def bucket(self, buckets, key, scope):
+        bucket = buckets.get(key)
+        if bucket is None:
+            settings = self.cooldowns[scope]
+            bucket = TokenBucket(settings["burst"], 1 / settings["refill_seconds"])
+            buckets.put(key, bucket)
+        return bucket
+
+    def allow(self, message):
+        """Take a token from both the channel's and the author's bucket, or from neither if either is empty"""
+        channel = self.bucket(self.channel_buckets, message.channel.id, "channel")
+        user = self.bucket(self.user_buckets, message.author.id, "user")
+        if channel.delay() > 0 or user.delay() > 0:
+            return False
+        channel.try_acquire()
+        user.try_acquire()
+        return True
 
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.author == self.bot.user:
             return  # Avoid responding to itself
-        
-        cst = pytz.timezone('US/Central')
-        current_time = datetime.now(cst)
-        lower_content = message.content.lower()
-        
-        morning_responses = [
-            "good morning, {}! Hope you have a great day!",
-            "Rise and shine, {}!",
-            "Morning, {}! Have you had your coffee yet?",
-            "Top of the morning to you, {}!"
-        ]
-        
-        if 6 <= current_time.hour < 12:
-            if any(phrase in lower_content for phrase in ["hi reece", "hello reece", "gm reece", "good morning reece"]):
-                response = random.choice(morning_responses).format(message.author.mention)
-                await message.channel.send(response)
-            
-        else:
-            if any(phrase in lower_content for phrase in ["hi reece", "hello reece"]):
-                response = random.choice(self.greetings).format(message.author.mention)
-                await message.channel.send(response)
-        
-        if "do a backflip reece" in lower_content or "reece do a backflip" in lower_content:
-            await message.channel.send("🤸")
-            time.sleep(0.5)
-            await message.channel.send("Ta-da!")
-        
-        if "fuck you reece" in lower_content:
-            await message.channel.send("One should always aim high. Set your aspirations beyond your reach and you will always have something to strive for.")
-        
-        if "tell me a joke reece" in lower_content:
-            jokes = [
-                "Why don't programmers like nature? It has too many bugs!",
-                "What do you call 8 hobbits? A hob-byte!",
-                "Why did the computer catch a cold? It left its Windows open!",
-                "I told my wife she should embrace her mistakes. She gave me a hug."
-            ]
-            await message.channel.send(random.choice(jokes))
 
-        if "gn reece" in lower_content or "good night reece" in lower_content or "goodnight reece" in lower_content:
-            await message.channel.send("Good night, {}".format(message.author.mention))
-        
-        if "what's your favorite color reece" in lower_content or "reece what is your favorite color" in lower_content or "what is your favorite color reece" in lower_content:
-            await message.channel.send("I like #00FF00, it's a very refreshing shade of green!")
-        
-        if "who made you reece" in lower_content:
-            await message.channel.send("I was created by some wonderful humans with way too much time on their hands!")
-        
-        if "reece tell me a fun fact" in lower_content or "tell me a fun fact reece" in lower_content:
-            await message.channel.send(random.choice(self.facts))
+        matcher = self.matcher
+        if message.guild is not None:
+            matcher = self.guild_matchers.get(message.guild.id, matcher)
+
+        triggers = matcher.match(message.content.lower())
+        # Over the cooldown, the message is simply ignored
+        if not triggers or not self.allow(message):
+            return
+
+        # Everything one message set off is coalesced into a single reply;
+        # the rest of any multi-part response follows after a pause
+        first, rest = [], []
+        for trigger in triggers:
+            response = trigger.response()
+            parts = response if isinstance(response, list) else [response]
+            first.append(parts[0])
+            rest.extend(parts[1:])
+
+        mention = message.author.mention
+        await outbound.send(message.channel, content="\n".join(part.format(mention) for part in first), droppable=True)
+        for part in rest:
+            await asyncio.sleep(SEQUENCE_DELAY)
+            await outbound.send(message.channel, content=part.format(mention), droppable=True)
 
 async def setup(bot):
     await bot.add_cog(AutoResponses(bot))
@@ -0,0 +1,149 @@
+import json
+import math
+import os
+import random
+import re
+import pytz
+from datetime import datetime
+
+
+class Trigger:
+    """One autoresponse: the phrases that set it off and the responses to pick from.
+
+    A response is either a message or a list of messages sent one after the
+    other. Triggers sharing a `group` are alternatives, only the first one
+    that matches fires; `hours` limits a trigger to [start, end) local time.
+    """
+
+    __slots__ = ("name", "phrases", "responses", "group", "hours")
+
+    def __init__(self, name, phrases, responses, group=None, hours=None):
+        self.name = name
+        self.phrases = [phrase.lower() for phrase in phrases]
+        self.responses = responses
+        self.group = group
+        self.hours = hours
+
+    def active(self, hour):
+        return self.hours is None or self.hours[0] <= hour < self.hours[1]
+
+    def response(self):
+        return random.choice(self.responses)
+
+
+class TriggerMatcher:
+    """A set of triggers compiled into a single regex.
+
+    Every phrase goes into one lookahead alternation, so a message is scanned
+    once however many triggers there are, and overlapping phrases ("hi reece
+    do a backflip") are all found. If every phrase contains `keyword`, messages
+    without it are rejected with a plain substring check before the regex runs.
+    """
+
+    def __init__(self, triggers, keyword=None, timezone=None):
+        self.triggers = triggers
+        self.timezone = timezone
+
+        phrases = sorted({phrase for trigger in triggers for phrase in trigger.phrases}, key=len, reverse=True)
+        # The regex only reports the longest phrase starting at each position,
+        # so each phrase also stands for any shorter phrase it starts with
+        self.by_phrase = {}
+        for phrase in phrases:
+            self.by_phrase[phrase] = {
+                index for index, trigger in enumerate(triggers)
+                if any(phrase.startswith(other) for other in trigger.phrases)
+            }
+        self.pattern = re.compile("(?=(" + "|".join(map(re.escape, phrases)) + "))") if phrases else None
+        self.keyword = keyword if keyword and all(keyword in phrase for phrase in phrases) else None
+
+    def match(self, content):
+        """Triggers set off by already lowercased message content, in the order they were defined"""
+        if self.pattern is None or (self.keyword is not None and self.keyword not in content):
+            return []
+
+        found = set()
+        for match in self.pattern.finditer(content):
+            found |= self.by_phrase[match.group(1)]
+        if not found:
+            return []
+
+        hour = datetime.now(self.timezone).hour if any(self.triggers[index].hours for index in found) else None
+        fired = []
+        groups = set()
+        for index in sorted(found):
+            trigger = self.triggers[index]
+            if trigger.group in groups or (hour is not None and not trigger.active(hour)):
+                continue
+            if trigger.group is not None:
+                groups.add(trigger.group)
+            fired.append(trigger)
+        return fired
+
+
+def load_responses(entry, data_dir):
+    """A trigger's responses, read from its responses_file when it has one"""
+    path = entry.get("responses_file")
+    if path is None:
+        return entry["responses"]
+    try:
+        with open(os.path.join(data_dir, path), "r", encoding="utf-8") as file:
+            return [line.strip() for line in file if line.strip()]
+    except FileNotFoundError:
+        print(f"Warning: {data_dir}/{path} not found. Using default {entry['name']} responses.")
+        return entry["responses"]
+
+
+def load_config(path="data/autoresponses.json"):
+    """The parsed autoresponse config, or an empty one if it is missing or broken"""
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        print(f"Warning: could not load {path} ({e}). Autoresponses are disabled.")
+        return {}
+
+
+def load_cooldowns(config, defaults):
+    """The config's cooldowns merged over `defaults`, replacing any value that isn't a positive number.
+
+    burst has to be at least 1 and refill_seconds above 0, anything else would
+    make every bucket either empty forever or divide by zero.
+    """
+    cooldowns = {}
+    for scope, scope_defaults in defaults.items():
+        settings = {**scope_defaults, **config.get("cooldowns", {}).get(scope, {})}
+        for name, default in scope_defaults.items():
+            value = settings[name]
+            is_number = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+            if not is_number or (value < 1 if name == "burst" else value <= 0):
+                print(f"Warning: invalid cooldowns.{scope}.{name} ({value!r}) in the autoresponse config. Using {default}.")
+                settings[name] = default
+        cooldowns[scope] = settings
+    return cooldowns
+
+
+def build_matchers(config, data_dir="data"):
+    """Compile the config's triggers into (default matcher, {guild id: matcher}).
+
+    Guild entries can list trigger names to leave out under "disabled" and add
+    or replace (by name) triggers under "triggers".
+    """
+    timezone = pytz.timezone(config.get("timezone", "UTC"))
+    keyword = config.get("keyword")
+
+    def build(entries):
+        return [
+            Trigger(entry["name"], entry["phrases"], load_responses(entry, data_dir), entry.get("group"), entry.get("hours"))
+            for entry in entries
+        ]
+
+    defaults = config.get("triggers", [])
+    guild_matchers = {}
+    for guild_id, overrides in config.get("guilds", {}).items():
+        disabled = set(overrides.get("disabled", []))
+        replaced = {entry["name"]: entry for entry in overrides.get("triggers", [])}
+        entries = [replaced.pop(entry["name"], entry) for entry in defaults if entry["name"] not in disabled]
+        entries += replaced.values()
+        guild_matchers[int(guild_id)] = TriggerMatcher(build(entries), keyword, timezone)
+
+    return TriggerMatcher(build(defaults), keyword, timezone), guild_matchers
@@ -0,0 +1,145 @@
+import discord
+from discord.ext import commands, tasks
+from collections import OrderedDict
+from utils.outbound import outbound
+
+PREVIOUS_PAGE = "⬅️"
+NEXT_PAGE = "➡️"
+
+# Seconds a paginator stays active after its last page flip
+DEFAULT_TIMEOUT = 60
+# Most paginators that can be open at once; the oldest is closed to make room
+MAX_SESSIONS = 500
+# One slot per second; must be longer than any timeout
+WHEEL_SLOTS = 128
+
+
+class TimerWheel:
+    """Hashed timer wheel with one-second slots.
+
+    Scheduling a key and collecting the keys that are due are both O(1) per
+    key, however many timers are pending.
+    """
+
+    def __init__(self, slots):
+        self.slots = [set() for _ in range(slots)]
+        self.tick = 0
+
+    def schedule(self, key, delay):
+        """Fire key after `delay` ticks (at most len(slots) - 1)"""
+        delay = max(1, min(delay, len(self.slots) - 1))
+        self.slots[(self.tick + delay) % len(self.slots)].add(key)
+
+    def advance(self):
+        """Move forward one tick and return the keys that fired"""
+        self.tick += 1
+        index = self.tick % len(self.slots)
+        fired, self.slots[index] = self.slots[index], set()
+        return fired
+
+
+class PaginatorSession:
+    __slots__ = ("message", "owner_id", "provider", "page", "max_pages", "timeout", "deadline")
+
+    def __init__(self, message, owner_id, provider, page, max_pages, timeout, deadline):
+        self.message = message
+        self.owner_id = owner_id
+        self.provider = provider
+        self.page = page
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.deadline = deadline
+
+
+class Paginator(commands.Cog):
+    """One service for every reaction-paginated message.
+
+    Commands hand over a page provider (an async function returning the embed
+    for a page number) and the paginator does the rest. Reaction events are
+    routed to their session with a single dict lookup by message id, and idle
+    sessions are closed by a timer wheel instead of each one holding a
+    wait_for coroutine open.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.sessions = OrderedDict()  # message id -> PaginatorSession
+        self.wheel = TimerWheel(WHEEL_SLOTS)
+        print("Paginator cog loaded")
+
+    async def cog_load(self):
+        self.expire_sessions.start()
+
+    def cog_unload(self):
+        self.expire_sessions.cancel()
+
+    async def start(self, ctx, provider, max_pages, page=1, timeout=DEFAULT_TIMEOUT):
+        """Send the first page and, if there is more than one, let the author flip through them"""
+        embed = await provider(page)
+        message = await ctx.send(embed=embed)
+        if max_pages <= 1:
+            return message
+
+        await message.add_reaction(PREVIOUS_PAGE)
+        await message.add_reaction(NEXT_PAGE)
+
+        while len(self.sessions) >= MAX_SESSIONS:
+            _, oldest = self.sessions.popitem(last=False)
+            self.bot.loop.create_task(self.close(oldest))
+
+        self.sessions[message.id] = PaginatorSession(
+            message, ctx.author.id, provider, page, max_pages, timeout, self.wheel.tick + timeout
+        )
+        self.wheel.schedule(message.id, timeout)
+        return message
+
+    async def close(self, session):
+        """Remove the navigation reactions from a session that is no longer active"""
+        try:
+            await session.message.clear_reactions()
+        except discord.HTTPException:
+            pass
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        session = self.sessions.get(payload.message_id)
+        if session is None or payload.user_id != session.owner_id:
+            return
+
+        emoji = str(payload.emoji)
+        if emoji == PREVIOUS_PAGE and session.page > 1:
+            session.page -= 1
+        elif emoji == NEXT_PAGE and session.page < session.max_pages:
+            session.page += 1
+        else:
+            if emoji in (PREVIOUS_PAGE, NEXT_PAGE):
+                await session.message.remove_reaction(payload.emoji, discord.Object(payload.user_id))
+            return
+
+        # Any interaction keeps the session alive for another timeout
+        session.deadline = self.wheel.tick + session.timeout
+        embed = await session.provider(session.page)
+        await outbound.edit(session.message, embed=embed)
+        await session.message.remove_reaction(payload.emoji, discord.Object(payload.user_id))
+
+    @tasks.loop(seconds=1)
+    async def expire_sessions(self):
+        """Advance the timer wheel and close sessions that have been idle for their whole timeout"""
+        for message_id in self.wheel.advance():
+            session = self.sessions.get(message_id)
+            if session is None:
+                continue
+            if session.deadline > self.wheel.tick:
+                # Used since it was scheduled, check again when the new deadline comes around
+                self.wheel.schedule(message_id, session.deadline - self.wheel.tick)
+                continue
+            del self.sessions[message_id]
+            await self.close(session)
+
+    @expire_sessions.before_loop
+    async def before_expire_sessions(self):
+        await self.bot.wait_until_ready()
+
+
+async def setup(bot):
+    await bot.add_cog(Paginator(bot))
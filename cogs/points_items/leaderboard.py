@@ -0,0 +1,131 @@
+import math
+import random
+
+# Enough levels for tens of millions of users
+MAX_LEVELS = 24
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # width[i] = how many positions next[i] is ahead of this node
+        self.width = [1] * levels
+
+
+class Leaderboard:
+    """In-memory ranking of users by points.
+
+    An indexable skip list ordered by (-points, user_id): every link also
+    records how many entries it skips, so updates, rank lookups and walking
+    to the top-N are all O(log n) regardless of how many users have points.
+    """
+
+    def __init__(self):
+        self.points = {}  # user id -> current points
+        self.head = _Node(None, MAX_LEVELS)
+        # Sentinel that sorts after every real key
+        self.tail = _Node((math.inf,), MAX_LEVELS)
+        self.tail.width = [0] * MAX_LEVELS
+        self.head.next = [self.tail] * MAX_LEVELS
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def _random_levels():
+        return min(MAX_LEVELS, 1 - int(math.log(1.0 - random.random(), 2.0)))
+
+    def load(self, rows):
+        """Replace the contents with (user_id, points) rows.
+
+        Builds the skip list in one pass over the sorted keys, which is much
+        faster than inserting users one at a time when loading at startup.
+        """
+        self.points = dict(rows)
+        self.head = _Node(None, MAX_LEVELS)
+        last = [self.head] * MAX_LEVELS
+        last_position = [0] * MAX_LEVELS
+
+        keys = sorted((-points, user_id) for user_id, points in self.points.items())
+        for position, key in enumerate(keys, 1):
+            node = _Node(key, self._random_levels())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = position - last_position[level]
+                last[level] = node
+                last_position[level] = position
+
+        end = len(keys) + 1
+        for level in range(MAX_LEVELS):
+            last[level].next[level] = self.tail
+            last[level].width[level] = end - last_position[level]
+
+    def _find(self, key):
+        """Return, per level, the last node before key and how far it is from the head"""
+        chain = [None] * MAX_LEVELS
+        position = [0] * MAX_LEVELS
+        node = self.head
+        steps = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                steps += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            position[level] = steps
+        return chain, position
+
+    def _insert(self, key):
+        chain, position = self._find(key)
+        levels = self._random_levels()
+        node = _Node(key, levels)
+        for level in range(levels):
+            prev = chain[level]
+            skipped = position[0] - position[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - skipped
+            prev.width[level] = skipped + 1
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+
+    def _remove(self, key):
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+
+    def update(self, user_id, points):
+        """Set a user's points, moving them to their new position"""
+        old = self.points.get(user_id)
+        if old == points:
+            return
+        if old is not None:
+            self._remove((-old, user_id))
+        self.points[user_id] = points
+        self._insert((-points, user_id))
+
+    def rank(self, user_id):
+        """1-based rank of a user (users with equal points share a rank), or None if they have no points"""
+        points = self.points.get(user_id)
+        if points is None:
+            return None
+        # Everyone strictly ahead sorts before (-points, -inf)
+        _, position = self._find((-points, -math.inf))
+        return position[0] + 1
+
+    def top(self, count):
+        """The `count` highest scoring users as (user_id, points) pairs"""
+        result = []
+        node = self.head.next[0]
+        while node is not self.tail and len(result) < count:
+            points, user_id = node.key
+            result.append((user_id, -points))
+            node = node.next[0]
+        return result
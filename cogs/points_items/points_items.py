@@ -1,43 +1,114 @@
 import discord
 from discord.ext import commands
-import matplotlib.pyplot as plt
 import io
-import sqlite3
-
-# Connect to SQLite database
-conn = sqlite3.connect("points.db")
-c = conn.cursor()
-c.execute("""
-CREATE TABLE IF NOT EXISTS points (
-    user_id INTEGER PRIMARY KEY,
-    points REAL DEFAULT 0.0
-)
-""")
-c.execute("""
-CREATE TABLE IF NOT EXISTS inventory (
-    user_id INTEGER,
-    item TEXT,
-    quantity INTEGER DEFAULT 1,
-    PRIMARY KEY (user_id, item)
-)
-""")
-conn.commit()
+import os
+import asyncio
+from typing import Union
+from utils.database import get_database
+from utils.render import render_service
+from utils.table import render_table
+from utils.encoding import encode_image, image_extension, upload_limit, DEFAULT_PRESET
+from utils.cache import ImageCache
+from cogs.points_items.leaderboard import Leaderboard
+from cogs.settings.guild_settings import guild_settings
+
+# Schema history of points.db, applied in order by Database.migrate.
+# inventory lookups by user_id are already served by its (user_id, item) primary key.
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS points (
+            user_id INTEGER PRIMARY KEY,
+            points REAL DEFAULT 0.0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            user_id INTEGER,
+            item TEXT,
+            quantity INTEGER DEFAULT 1,
+            PRIMARY KEY (user_id, item)
+        )
+        """,
+    ]),
+    # Leaderboard queries order by points
+    (2, [
+        "CREATE INDEX IF NOT EXISTS idx_points_points ON points (points DESC)",
+    ]),
+]
+
+# Rows shown by !ranking, and the most that can be requested
+DEFAULT_RANKING_SIZE = 10
+MAX_RANKING_SIZE = 50
+# Rendered !ranking images kept in memory, and on disk when IMAGE_CACHE_DIR is set
+RANKING_CACHE_BYTES = 16 * 1024 * 1024
+RANKING_DISK_CACHE_BYTES = 128 * 1024 * 1024
+# Part of the cache key; bump it whenever the look of the ranking image changes
+RANKING_IMAGE_VERSION = 2
+
+ADD_POINTS_SQL = "INSERT INTO points (user_id, points) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET points = points + ?"
+REMOVE_POINTS_SQL = "INSERT INTO points (user_id, points) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET points = points - ?"
+GIVE_ITEM_SQL = "INSERT INTO inventory (user_id, item, quantity) VALUES (?, ?, ?) ON CONFLICT(user_id, item) DO UPDATE SET quantity = quantity + ?"
+
+def bulk_upsert_points(conn, sql, rows):
+    """Apply a points upsert for many users at once and return their new totals"""
+    conn.executemany(sql, rows)
+    user_ids = [row[0] for row in rows]
+    totals = []
+    for i in range(0, len(user_ids), 500):
+        batch = user_ids[i:i + 500]
+        placeholders = ", ".join("?" * len(batch))
+        totals += conn.execute(f"SELECT user_id, points FROM points WHERE user_id IN ({placeholders})", batch).fetchall()
+    return totals
+
+def format_member_list(members, limit=1500):
+    """Comma separated display names, cut short with "and N more" so messages stay under Discord's limit"""
+    text = ""
+    for i, member in enumerate(members):
+        name = member.display_name if not text else f", {member.display_name}"
+        if len(text) + len(name) > limit:
+            return f"{text} and {len(members) - i} more"
+        text += name
+    return text
+
+def render_ranking_table(table_data, preset=DEFAULT_PRESET, max_bytes=None):
+    """Draw the !ranking table ([name, points, items] rows) and return it as an EncodedImage.
+
+    Runs in a render worker process, so it only takes and returns picklable values.
+    """
+    table = render_table(["User", "Points", "Items"], table_data, title=f"Top {len(table_data)} Users by Points")
+    return encode_image(table, preset, max_bytes)
+
 
 class PointsItemsCog(commands.Cog):
         def __init__(self, bot):
             self.bot = bot
+            # Points are awarded by commands, so every commit is fsynced; group commit keeps that cheap
+            self.db = get_database("points.db", synchronous="FULL")
+            # Everyone's points, kept in rank order in memory for !ranking and !rank
+            self.leaderboard = Leaderboard()
+            cache_dir = os.getenv("IMAGE_CACHE_DIR")
+            self.ranking_images = ImageCache(
+                RANKING_CACHE_BYTES,
+                os.path.join(cache_dir, "ranking") if cache_dir else None,
+                RANKING_DISK_CACHE_BYTES,
+            )
             print("Points and Items cog loaded")
 
+        async def cog_load(self):
+            await self.db.migrate(MIGRATIONS)
+            await self.ranking_images.load()
+            rows = await self.db.query("SELECT user_id, points FROM points")
+            await asyncio.get_running_loop().run_in_executor(None, self.leaderboard.load, rows)
+
         @commands.command()
         async def points(self, ctx, member: discord.Member = None):
             """Displays a user's points and items"""
             user_id = member.id if member else ctx.author.id
-            c.execute("SELECT points FROM points WHERE user_id = ?", (user_id,))
-            result = c.fetchone()
+            result = await self.db.query_one("SELECT points FROM points WHERE user_id = ?", (user_id,))
             points = result[0] if result else 0.0
 
-            c.execute("SELECT item, quantity FROM inventory WHERE user_id = ?", (user_id,))
-            items = c.fetchall()
+            items = await self.db.query("SELECT item, quantity FROM inventory WHERE user_id = ?", (user_id,))
             items_text = ", ".join([f"{item} x{quantity}" for item, quantity in items]) if items else "No items"
             
             await ctx.send(f"{member.mention if member else ctx.author.mention} has {points} points and items: {items_text}.")
@@ -58,9 +129,8 @@ class PointsItemsCog(commands.Cog):
                 await ctx.send("Do not send less than 0 points")
                 return
 
-            c.execute("INSERT INTO points (user_id, points) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET points = points + ?", 
-                         (member.id, amount, amount))
-            conn.commit()
+            result = await self.db.execute_batched(ADD_POINTS_SQL + " RETURNING points", (member.id, amount, amount))
+            self.leaderboard.update(member.id, float(result.rows[0][0]))
             await ctx.send(f"{ctx.author.mention} gave {amount} points to {member.mention}.")
 
         @addpoints.error
@@ -79,9 +149,8 @@ class PointsItemsCog(commands.Cog):
                 await ctx.send("Can't remove negative points")
                 return
                 
-            c.execute("INSERT INTO points (user_id, points) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET points = points - ?", 
-                         (member.id, 0.0, amount))
-            conn.commit()
+            result = await self.db.execute_batched(REMOVE_POINTS_SQL + " RETURNING points", (member.id, 0.0, amount))
+            self.leaderboard.update(member.id, float(result.rows[0][0]))
             await ctx.send(f"{ctx.author.mention} removed {amount} points from {member.mention}.")
 
         @removepoints.error
@@ -92,19 +161,19 @@ class PointsItemsCog(commands.Cog):
         @commands.command()
         async def giveitem(self, ctx, member: discord.Member, quantity: int, *, item: str):
             """Gives an item to a user - !giveitem @user <quantity> <item name>"""
-            c.execute("INSERT INTO inventory (user_id, item, quantity) VALUES (?, ?, ?) ON CONFLICT(user_id, item) DO UPDATE SET quantity = quantity + ?", 
-                         (member.id, item, quantity, quantity))
-            conn.commit()
+            await self.db.execute_batched(GIVE_ITEM_SQL, (member.id, item, quantity, quantity))
             await ctx.send(f"{ctx.author.mention} gave {member.mention} {quantity} {item}.")
 
         @commands.command()
         async def removeitem(self, ctx, member: discord.Member, quantity: int, *, item: str):
             """Removes an item from a user - !removeitem @user <quantity> <item name>"""
-            c.execute("UPDATE inventory SET quantity = MAX(0, quantity - ?) WHERE user_id = ? AND item = ?", 
-                         (quantity, member.id, item))
-            c.execute("DELETE FROM inventory WHERE user_id = ? AND item = ? AND quantity = 0", 
-                         (member.id, item))
-            conn.commit()
+            def remove(conn):
+                conn.execute("UPDATE inventory SET quantity = MAX(0, quantity - ?) WHERE user_id = ? AND item = ?", 
+                             (quantity, member.id, item))
+                conn.execute("DELETE FROM inventory WHERE user_id = ? AND item = ? AND quantity = 0", 
+                             (member.id, item))
+
+            await self.db.run_batched(remove)
             await ctx.send(f"{ctx.author.mention} removed {quantity} {item} from {member.mention}.")
 
         @giveitem.error
@@ -112,73 +181,161 @@ class PointsItemsCog(commands.Cog):
             if isinstance(error, commands.MemberNotFound):
                 await ctx.send("Member not found. Please mention a valid user.")
 
+        def expand_targets(self, targets):
+            """Turn a mix of members and roles into a list of unique members (skipping bots in roles)"""
+            members = {}
+            for target in targets:
+                if isinstance(target, discord.Role):
+                    for member in target.members:
+                        if not member.bot:
+                            members[member.id] = member
+                else:
+                    members[target.id] = target
+            return list(members.values())
+
+        async def apply_bulk_points(self, sql, rows):
+            """Upsert points for many users in one transaction and refresh the leaderboard"""
+            totals = await self.db.transaction(bulk_upsert_points, sql, rows)
+            for user_id, points in totals:
+                self.leaderboard.update(user_id, float(points))
+
         @commands.command()
-        async def ranking(self, ctx):
-            """Displays the top 10 users with the most points and sends a styled table"""
-            c.execute("SELECT user_id, points FROM points ORDER BY points DESC LIMIT 10")
-            ranking = c.fetchall()
-            if not ranking:
-                await ctx.send("No points data available.")
+        async def bulkaddpoints(self, ctx, targets: commands.Greedy[Union[discord.Member, discord.Role]], amount: float):
+            """Adds points to several users or whole roles at once - !bulkaddpoints @user @role ... <amount>"""
+            if amount >= 50:
+                await ctx.send("Do not give more than 50 points at a time")
                 return
+
+            if amount < 0:
+                await ctx.send("Do not send less than 0 points")
+                return
+
+            members = self.expand_targets(targets)
+            if not members:
+                await ctx.send("Mention at least one member or role.")
+                return
+
+            await self.apply_bulk_points(ADD_POINTS_SQL, [(member.id, amount, amount) for member in members])
+            await ctx.send(f"{ctx.author.mention} gave {amount} points to {len(members)} members: {format_member_list(members)}.")
+
+        @commands.command()
+        async def bulkremovepoints(self, ctx, targets: commands.Greedy[Union[discord.Member, discord.Role]], amount: float):
+            """Removes points from several users or whole roles at once - !bulkremovepoints @user @role ... <amount>"""
+            if amount >= 50:
+                await ctx.send("Do not give more than 50 points at a time")
+                return
+
+            if amount < 0:
+                await ctx.send("Can't remove negative points")
+                return
+
+            members = self.expand_targets(targets)
+            if not members:
+                await ctx.send("Mention at least one member or role.")
+                return
+
+            await self.apply_bulk_points(REMOVE_POINTS_SQL, [(member.id, 0.0, amount) for member in members])
+            await ctx.send(f"{ctx.author.mention} removed {amount} points from {len(members)} members: {format_member_list(members)}.")
+
+        @commands.command()
+        async def bulkgiveitem(self, ctx, targets: commands.Greedy[Union[discord.Member, discord.Role]], quantity: int, *, item: str):
+            """Gives an item to several users or whole roles at once - !bulkgiveitem @user @role ... <quantity> <item name>"""
+            members = self.expand_targets(targets)
+            if not members:
+                await ctx.send("Mention at least one member or role.")
+                return
+
+            await self.db.executemany(GIVE_ITEM_SQL, [(member.id, item, quantity, quantity) for member in members])
+            await ctx.send(f"{ctx.author.mention} gave {quantity} {item} to {len(members)} members: {format_member_list(members)}.")
+
+        @bulkaddpoints.error
+        @bulkremovepoints.error
+        @bulkgiveitem.error
+        async def bulk_error(self, ctx, error):
+            if isinstance(error, (commands.BadArgument, commands.MissingRequiredArgument)):
+                await ctx.send("Usage: mention the members and/or roles first, then the amount. Example: `!bulkaddpoints @user @Raiders 10`")
+
+        @commands.command()
+        async def rank(self, ctx, member: discord.Member = None):
+            """Displays a user's position on the leaderboard - !rank [@user]"""
+            member = member or ctx.author
+            position = self.leaderboard.rank(member.id)
+            if position is None:
+                await ctx.send(f"{member.mention} doesn't have any points yet.")
+                return
+
+            points = self.leaderboard.points[member.id]
+            await ctx.send(f"{member.mention} is ranked #{position} of {len(self.leaderboard)} with {points} points.")
+
+        @rank.error
+        async def rank_error(self, ctx, error):
+            if isinstance(error, commands.MemberNotFound):
+                await ctx.send("Member not found. Please mention a valid user.")
+
+        async def resolve_member_names(self, guild, user_ids):
+            """Map user ids to display names, using the member cache and one batched lookup for misses"""
+            names = {}
+            missing = []
+            for user_id in user_ids:
+                member = guild.get_member(user_id)
+                if member:
+                    names[user_id] = member.display_name
+                else:
+                    missing.append(user_id)
             
-            # Prepare data for the table
-            table_data = []
-            for user_id, points in ranking:
+            # query_members asks the gateway for up to 100 ids at once instead of one REST call each
+            for i in range(0, len(missing), 100):
                 try:
-                    member = await ctx.guild.fetch_member(user_id)
-                    if not member:
-                        raise Exception("Member not found")
+                    members = await guild.query_members(user_ids=missing[i:i + 100], limit=100)
                 except Exception:
-                    member = None
-                    member_name = "Unknown Member"
-                else:
-                    member_name = member.display_name
-                
-                # Get the user's items
-                c.execute("SELECT item, quantity FROM inventory WHERE user_id = ?", (user_id,))
-                items = c.fetchall()
-                items_text = ", ".join([f"{item} x{quantity}" for item, quantity in items]) if items else "No items"
-                table_data.append([member_name, points, items_text])
-
-            # Create the figure and axis
-            fig, ax = plt.subplots(figsize=(10, 6))
-
-            # Hide axes
-            ax.axis("off")
-
-            # Create the table with headers
-            table = ax.table(cellText=table_data, colLabels=["User", "Points", "Items"], loc="center", cellLoc='center')
-
-            # Styling the table
-            table.auto_set_font_size(False)
-            table.set_fontsize(12)
-            table.scale(1.2, 1.2)  # Scale the table for better readability
-
-            # Set the header style
-            for (i, j), cell in table.get_celld().items():
-                if i == 0:
-                    cell.set_fontsize(14)
-                    cell.set_text_props(weight='bold')
-                    cell.set_facecolor('#4CAF50')  # Header background color
-                    cell.set_edgecolor('black')
-                else:
-                    cell.set_edgecolor('gray')  # Set the border color of each cell
-                    cell.set_facecolor('#f2f2f2')  # Cell background color
-
-            # Set alternating row colors
-            for i, row in enumerate(table.get_celld().values()):
-                if i % 2 == 1:  # Change background color for alternating rows
-                    row.set_facecolor('#e6e6e6')
+                    continue
+                for member in members:
+                    names[member.id] = member.display_name
+            
+            return names
+        
+        @commands.command()
+        async def ranking(self, ctx, count: int = DEFAULT_RANKING_SIZE):
+            """Displays the top users with the most points and sends a styled table - !ranking [count]"""
+            count = max(1, min(count, MAX_RANKING_SIZE))
+            
+            # Top users come from the in-memory leaderboard, their items from a single query
+            ranking = self.leaderboard.top(count)
+            if not ranking:
+                await ctx.send("No points data available.")
+                return
 
-            # Add a title to the table
-            plt.title("Top 10 Users by Points", fontsize=16, fontweight='bold')
+            user_ids = [user_id for user_id, _ in ranking]
+            placeholders = ", ".join("?" * len(user_ids))
+            items = dict(await self.db.query(f"""
+                SELECT user_id, GROUP_CONCAT(item || ' x' || quantity, ', ')
+                FROM inventory
+                WHERE user_id IN ({placeholders})
+                GROUP BY user_id
+            """, user_ids))
 
-            # Save the table to a buffer
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format="png", bbox_inches="tight")
-            buffer.seek(0)
-            plt.close()
+            # Prepare data for the table
+            names = await self.resolve_member_names(ctx.guild, user_ids)
+            table_data = []
+            for user_id, points in ranking:
+                member_name = names.get(user_id, "Unknown Member")
+                table_data.append([member_name, points, items.get(user_id) or "No items"])
+            
+            # Identical tables give identical images, so only render ones we haven't seen
+            # The byte budget is part of the key too, an image that fit one guild's upload limit may not fit another's
+            preset = guild_settings.image_format(ctx.guild)
+            max_bytes = upload_limit(ctx.guild)
+            key = ImageCache.key("ranking", RANKING_IMAGE_VERSION, preset, max_bytes, table_data)
+            image = await self.ranking_images.get(key)
+            if image is None:
+                encoded = await render_service.render(ctx, render_ranking_table, table_data, preset, max_bytes)
+                if encoded is None:
+                    return
+                image, details = encoded.data, encoded.summary()
+                await self.ranking_images.put(key, image)
+            else:
+                details = "cached"
 
             # Send the styled table as an image
-            file = discord.File(buffer, filename="ranking.png")
-            await ctx.send("Here is the leaderboard table:", file=file)
\ No newline at end of file
+            file = discord.File(io.BytesIO(image), filename=f"ranking.{image_extension(image)}")
+            await ctx.send(f"Here is the leaderboard table:\n-# {details}", file=file)
\ No newline at end of file
@@ -1,34 +1,100 @@
 import discord
-from discord.ext import commands, tasks
-import sqlite3
+from discord.ext import commands
 import asyncio
-from datetime import datetime, timedelta
+import heapq
+import time
+from datetime import datetime, timedelta, timezone
 import re
+from utils.database import get_database
+from utils.migrations import rebuild_table
+from utils.outbound import outbound
+
+def to_epoch(iso_str):
+    """Convert a (naive, UTC) ISO timestamp from the old schema into epoch seconds"""
+    return datetime.fromisoformat(iso_str).replace(tzinfo=timezone.utc).timestamp()
+
+REMINDER_COLUMNS = ["id", "user_id", "channel_id", "message", "remind_at", "created_at"]
+
+def convert_timestamps(conn):
+    """Store remind_at/created_at as integer epoch seconds instead of ISO text, and index them by user"""
+    def convert(row):
+        return (*row[:4], int(to_epoch(row[4])), int(to_epoch(row[5])))
+    
+    rebuild_table(conn, "reminders", """
+        CREATE TABLE reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            remind_at INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """, REMINDER_COLUMNS, convert)
+    conn.execute("CREATE INDEX idx_reminders_user ON reminders (user_id, remind_at)")
+
+# Schema history of reminders.db, applied in order by Database.migrate
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS reminders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            remind_at TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """,
+    ]),
+    (2, convert_timestamps),
+]
+
+# Maximum number of ids per "WHERE id IN (...)" query, well under SQLite's variable limit
+ID_BATCH_SIZE = 500
+# Maximum number of reminders being sent at the same time
+DELIVERY_CONCURRENCY = 10
+# ... and to a single channel, so one channel's backlog (paced by outbound at about
+# one message a second) can't take every delivery slot from the others
+CHANNEL_DELIVERY_CONCURRENCY = 2
+# Reminders listed per !reminders page
+REMINDERS_PER_PAGE = 10
 
 class Reminders(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.db_path = "reminders.db"
-        self.init_database()
-        self.check_reminders.start()
+        self.db = get_database("reminders.db")
+        # Min-heap of (remind_at epoch, reminder id) for every pending reminder.
+        # Cancelled reminders are dropped from self.pending and their heap entries
+        # are skipped when they reach the top.
+        self.queue = []
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.scheduler_task = None
+        self.delivery_limit = asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        # channel_id -> [semaphore, deliveries using it], dropped once no delivery needs it
+        self.channel_limits = {}
+        self.deliveries = set()
         print("Reminders cog loaded")
     
-    def init_database(self):
-        """Initialize the reminders database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reminders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                channel_id INTEGER NOT NULL,
-                message TEXT NOT NULL,
-                remind_at TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            )
-        """)
-        conn.commit()
-        conn.close()
+    async def cog_load(self):
+        """Initialize the reminders database, load pending reminders and start the scheduler"""
+        await self.db.migrate(MIGRATIONS)
+        rows = await self.db.query("SELECT id, remind_at FROM reminders")
+        self.pending = dict(rows)
+        self.queue = [(remind_at, reminder_id) for reminder_id, remind_at in self.pending.items()]
+        heapq.heapify(self.queue)
+        self.scheduler_task = self.bot.loop.create_task(self.run_scheduler())
+    
+    def schedule(self, reminder_id, remind_at):
+        """Add a reminder to the in-memory queue, waking the scheduler if it is now the earliest"""
+        self.pending[reminder_id] = remind_at
+        heapq.heappush(self.queue, (remind_at, reminder_id))
+        if self.queue[0][1] == reminder_id:
+            self.wakeup.set()
+    
+    def unschedule(self, reminder_id):
+        """Forget a reminder; its heap entry is discarded lazily"""
+        self.pending.pop(reminder_id, None)
     
     def parse_time(self, time_str):
         """Parse time string like '1h', '30m', '2d', '1h30m' into a timedelta"""
@@ -73,19 +139,17 @@ class Reminders(commands.Cog):
             await ctx.send(f"{ctx.author.mention}, reminder can't be more than 1 year!")
             return
         
-        remind_at = datetime.utcnow() + delta
-        created_at = datetime.utcnow()
+        # The time argument shadows the time module here
+        created_at = int(datetime.now(timezone.utc).timestamp())
+        remind_at = created_at + int(delta.total_seconds())
         
         # Save to database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
+        result = await self.db.execute("""
             INSERT INTO reminders (user_id, channel_id, message, remind_at, created_at)
             VALUES (?, ?, ?, ?, ?)
-        """, (ctx.author.id, ctx.channel.id, message, remind_at.isoformat(), created_at.isoformat()))
-        reminder_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        """, (ctx.author.id, ctx.channel.id, message, remind_at, created_at))
+        reminder_id = result.lastrowid
+        self.schedule(reminder_id, remind_at)
         
         # Create embed
         embed = discord.Embed(
@@ -93,7 +157,7 @@ class Reminders(commands.Cog):
             description=f"I'll remind you about: **{message}**",
             color=discord.Color.green()
         )
-        embed.add_field(name="When", value=f"<t:{int(remind_at.timestamp())}:R>", inline=False)
+        embed.add_field(name="When", value=f"<t:{remind_at}:R>", inline=False)
         embed.set_footer(text=f"Reminder ID: {reminder_id}")
         
         await ctx.send(embed=embed)
@@ -101,120 +165,158 @@ class Reminders(commands.Cog):
     @commands.command(name="reminders", aliases=["myreminders", "listreminders"])
     async def list_reminders(self, ctx):
         """List all your active reminders"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, message, remind_at
-            FROM reminders
-            WHERE user_id = ?
-            ORDER BY remind_at ASC
-        """, (ctx.author.id,))
-        reminders = cursor.fetchall()
-        conn.close()
-        
-        if not reminders:
+        total = (await self.db.query_one("SELECT COUNT(*) FROM reminders WHERE user_id = ?", (ctx.author.id,)))[0]
+        
+        if total == 0:
             await ctx.send(f"{ctx.author.mention}, you have no active reminders!")
             return
         
-        embed = discord.Embed(
-            title=f"⏰ {ctx.author.display_name}'s Reminders",
-            color=discord.Color.blue()
-        )
+        max_pages = (total + REMINDERS_PER_PAGE - 1) // REMINDERS_PER_PAGE
         
-        for reminder_id, message, remind_at_str in reminders[:10]:  # Limit to 10
-            remind_at = datetime.fromisoformat(remind_at_str)
-            timestamp = int(remind_at.timestamp())
-            embed.add_field(
-                name=f"ID: {reminder_id}",
-                value=f"{message}\n<t:{timestamp}:R>",
-                inline=False
+        async def provider(page):
+            reminders = await self.db.query("""
+                SELECT id, message, remind_at
+                FROM reminders
+                WHERE user_id = ?
+                ORDER BY remind_at ASC
+                LIMIT ? OFFSET ?
+            """, (ctx.author.id, REMINDERS_PER_PAGE, (page - 1) * REMINDERS_PER_PAGE))
+            
+            embed = discord.Embed(
+                title=f"⏰ {ctx.author.display_name}'s Reminders",
+                color=discord.Color.blue()
             )
+            
+            for reminder_id, message, remind_at in reminders:
+                embed.add_field(
+                    name=f"ID: {reminder_id}",
+                    value=f"{message}\n<t:{remind_at}:R>",
+                    inline=False
+                )
+            
+            embed.set_footer(text=f"Page {page}/{max_pages} • {total} reminders")
+            return embed
         
-        if len(reminders) > 10:
-            embed.set_footer(text=f"Showing 10 of {len(reminders)} reminders")
-        
-        await ctx.send(embed=embed)
+        await self.bot.get_cog("Paginator").start(ctx, provider, max_pages)
     
     @commands.command(name="cancelreminder", aliases=["deletereminder", "rmreminder"])
     async def cancel_reminder(self, ctx, reminder_id: int):
         """Cancel a reminder by ID. Usage: !cancelreminder <id>"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Check if reminder exists and belongs to user
-        cursor.execute("""
-            SELECT id FROM reminders
+        # Delete the reminder only if it exists and belongs to the user
+        result = await self.db.execute("""
+            DELETE FROM reminders
             WHERE id = ? AND user_id = ?
         """, (reminder_id, ctx.author.id))
         
-        if cursor.fetchone() is None:
-            conn.close()
+        if result.rowcount == 0:
             await ctx.send(f"{ctx.author.mention}, reminder not found or doesn't belong to you")
             return
         
-        cursor.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
-        conn.commit()
-        conn.close()
+        self.unschedule(reminder_id)
         
         await ctx.send(f"{ctx.author.mention}, reminder #{reminder_id} has been cancelled!")
     
-    @tasks.loop(seconds=30)
-    async def check_reminders(self):
-        """Background task to check for due reminders"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            now = datetime.utcnow()
-            cursor.execute("""
+    async def run_scheduler(self):
+        """Background task that sleeps until the next reminder is due, then delivers it"""
+        await self.bot.wait_until_ready()
+        while True:
+            try:
+                self.wakeup.clear()
+                
+                # Discard heap entries of cancelled reminders
+                while self.queue and self.pending.get(self.queue[0][1]) != self.queue[0][0]:
+                    heapq.heappop(self.queue)
+                
+                if not self.queue:
+                    await self.wakeup.wait()
+                    continue
+                
+                delay = self.queue[0][0] - time.time()
+                if delay > 0:
+                    # Sleep until the next reminder is due, or until an earlier one is scheduled
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                # Collect everything that is due now
+                now = time.time()
+                due_ids = []
+                while self.queue and self.queue[0][0] <= now:
+                    remind_at, reminder_id = heapq.heappop(self.queue)
+                    if self.pending.get(reminder_id) == remind_at:
+                        del self.pending[reminder_id]
+                        due_ids.append(reminder_id)
+                
+                if due_ids:
+                    # Delivered in the background, so a slow channel never holds up the next due reminder
+                    delivery = self.bot.loop.create_task(self.deliver_reminders(due_ids))
+                    self.deliveries.add(delivery)
+                    delivery.add_done_callback(self.deliveries.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in reminder scheduler: {e}")
+                await asyncio.sleep(1)
+    
+    async def deliver_reminders(self, reminder_ids):
+        """Send and delete the given due reminders"""
+        due_reminders = []
+        for i in range(0, len(reminder_ids), ID_BATCH_SIZE):
+            batch = reminder_ids[i:i + ID_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            due_reminders += await self.db.query(f"""
                 SELECT id, user_id, channel_id, message, created_at
                 FROM reminders
-                WHERE remind_at <= ?
-            """, (now.isoformat(),))
-            
-            due_reminders = cursor.fetchall()
-            
-            for reminder_id, user_id, channel_id, message, created_at_str in due_reminders:
-                try:
-                    channel = self.bot.get_channel(channel_id)
-                    if channel:
-                        user = await self.bot.fetch_user(user_id)
-                        
-                        created_at = datetime.fromisoformat(created_at_str)
-                        time_ago = int(created_at.timestamp())
-                        
-                        embed = discord.Embed(
-                            title="⏰ Reminder!",
-                            description=f"{user.mention}, you asked me to remind you:",
-                            color=discord.Color.gold()
-                        )
-                        embed.add_field(name="Message", value=message, inline=False)
-                        embed.add_field(name="Set", value=f"<t:{time_ago}:R>", inline=False)
-                        
-                        await channel.send(embed=embed)
-                    
-                    # Delete the reminder
-                    cursor.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
-                    conn.commit()
-                    
-                except Exception as e:
-                    print(f"Error sending reminder {reminder_id}: {e}")
-                    # Still delete the reminder even if sending fails
-                    cursor.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
-                    conn.commit()
-            
-            conn.close()
-        except Exception as e:
-            print(f"Error in check_reminders: {e}")
+                WHERE id IN ({placeholders})
+            """, batch)
+        
+        by_channel = {}
+        for reminder in due_reminders:
+            by_channel.setdefault(reminder[2], []).append(reminder)
+        
+        # Channels are delivered to side by side, each at its own pace
+        await asyncio.gather(*(self.deliver_to_channel(channel_id, reminders) for channel_id, reminders in by_channel.items()))
     
-    @check_reminders.before_loop
-    async def before_check_reminders(self):
-        """Wait until the bot is ready before starting the task"""
-        await self.bot.wait_until_ready()
+    async def deliver_to_channel(self, channel_id, reminders):
+        """Send one channel's due reminders, then delete them in one transaction (even the ones that failed to send)"""
+        entry = self.channel_limits.setdefault(channel_id, [asyncio.Semaphore(CHANNEL_DELIVERY_CONCURRENCY), 0])
+        entry[1] += 1
+        try:
+            await asyncio.gather(*(self.send_reminder(entry[0], *reminder) for reminder in reminders))
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self.channel_limits[channel_id]
+        await self.db.executemany("DELETE FROM reminders WHERE id = ?", [(reminder[0],) for reminder in reminders])
+    
+    async def send_reminder(self, channel_limit, reminder_id, user_id, channel_id, message, created_at):
+        """Send a single reminder to its channel"""
+        # The channel's slot is taken first, so reminders queued behind a busy channel don't hold global slots
+        async with channel_limit, self.delivery_limit:
+            try:
+                channel = self.bot.get_channel(channel_id)
+                if channel:
+                    # A raw mention renders the same as user.mention, without a REST lookup
+                    embed = discord.Embed(
+                        title="⏰ Reminder!",
+                        description=f"<@{user_id}>, you asked me to remind you:",
+                        color=discord.Color.gold()
+                    )
+                    embed.add_field(name="Message", value=message, inline=False)
+                    embed.add_field(name="Set", value=f"<t:{created_at}:R>", inline=False)
+                    
+                    await outbound.send(channel, embed=embed)
+            except Exception as e:
+                print(f"Error sending reminder {reminder_id}: {e}")
     
     def cog_unload(self):
         """Cleanup when cog is unloaded"""
-        self.check_reminders.cancel()
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+        for delivery in self.deliveries:
+            delivery.cancel()
 
 async def setup(bot):
     await bot.add_cog(Reminders(bot))
@@ -0,0 +1,33 @@
+from utils.encoding import DEFAULT_PRESET
+
+
+class GuildSettings:
+    """Per-guild settings, read from memory and written through to settings.db.
+
+    Loaded once by the Settings cog; other cogs look values up here instead
+    of querying the database on every command.
+    """
+
+    def __init__(self):
+        self.image_formats = {}  # guild_id -> encoding preset name
+
+    async def load(self, db):
+        rows = await db.query("SELECT guild_id, image_format FROM guild_settings WHERE image_format IS NOT NULL")
+        self.image_formats = dict(rows)
+
+    def image_format(self, guild):
+        """Encoding preset for images sent in a guild (or in DMs when guild is None)"""
+        if guild is None:
+            return DEFAULT_PRESET
+        return self.image_formats.get(guild.id, DEFAULT_PRESET)
+
+    async def set_image_format(self, db, guild_id, preset):
+        await db.execute("""
+            INSERT INTO guild_settings (guild_id, image_format) VALUES (?, ?)
+            ON CONFLICT(guild_id) DO UPDATE SET image_format = excluded.image_format
+        """, (guild_id, preset))
+        self.image_formats[guild_id] = preset
+
+
+# Shared by every cog that needs a guild's settings
+guild_settings = GuildSettings()
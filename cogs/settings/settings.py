@@ -0,0 +1,53 @@
+from discord.ext import commands
+from utils.database import get_database
+from utils.encoding import PRESETS, DEFAULT_PRESET
+from cogs.settings.guild_settings import guild_settings
+
+# Schema history of settings.db, applied in order by Database.migrate
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            image_format TEXT
+        )
+        """,
+    ]),
+]
+
+
+class Settings(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = get_database("settings.db")
+        print("Settings cog loaded")
+
+    async def cog_load(self):
+        await self.db.migrate(MIGRATIONS)
+        await guild_settings.load(self.db)
+
+    @commands.command(name="imageformat", aliases=["imageencoding"])
+    @commands.guild_only()
+    async def image_format(self, ctx, preset: str = None):
+        """Shows or sets how this server's rendered images are encoded - !imageformat [preset]"""
+        if preset is None:
+            current = guild_settings.image_format(ctx.guild)
+            presets = "\n".join(f"`{name}` - {settings.description}" for name, settings in PRESETS.items())
+            await ctx.send(f"Images here are encoded as `{current}`. Available formats:\n{presets}")
+            return
+
+        if not ctx.author.guild_permissions.manage_guild:
+            await ctx.send("You need the Manage Server permission to change the image format.")
+            return
+
+        preset = preset.lower()
+        if preset not in PRESETS:
+            await ctx.send(f"Unknown format `{preset}`. Use one of: {', '.join(PRESETS)} (default: {DEFAULT_PRESET})")
+            return
+
+        await guild_settings.set_image_format(self.db, ctx.guild.id, preset)
+        await ctx.send(f"Rendered images will now be sent as `{preset}`: {PRESETS[preset].description}")
+
+
+async def setup(bot):
+    await bot.add_cog(Settings(bot))
@@ -0,0 +1,176 @@
+"""A local stand-in for the Spotify Web API, for exercising SpotifyClient without Spotify.
+
+    python -m cogs.spotify.fake_server [port]
+
+serves a handful of generated tracks on http://localhost:<port>/v1. From code,
+`await start_fake_server()` returns the runner, the API url to hand to
+SpotifyClient(api_url=...) and the FakeSpotify holding the server's state.
+Any bearer token is accepted.
+"""
+import asyncio
+import sys
+import uuid
+from aiohttp import web
+
+
+class FakeSpotify:
+    """Tracks and playlists behind the fake API.
+
+    `latency` delays every response, and statuses pushed onto `failures` are
+    returned, in order, instead of the next responses (429s carry a
+    Retry-After of `retry_after`), to exercise timeouts and retries.
+    """
+
+    def __init__(self, track_count=50, latency=0.0, retry_after=0):
+        self.tracks = {}
+        self.albums = {}
+        self.playlists = {}  # id -> list of track uris
+        self.latency = latency
+        self.retry_after = retry_after
+        self.failures = []
+        self.requests = 0
+        self.adds = 0  # playlist add calls
+        self.playlist_names = {}
+        for number in range(1, track_count + 1):
+            self.add_track(f"Song {number}", f"Artist {number % 7 + 1}", f"Album {number % 5 + 1}")
+
+    def add_track(self, name, artist, album):
+        album = self.albums.get(album) or self.add_album(album)
+        track_id = uuid.uuid4().hex[:22]
+        self.tracks[track_id] = {
+            "id": track_id,
+            "uri": f"spotify:track:{track_id}",
+            "name": name,
+            "artists": [{"name": artist}],
+            "album": {"id": album["id"], "name": album["name"], "images": album["images"]},
+        }
+        album["tracks"].append(track_id)
+        return self.tracks[track_id]
+
+    def add_album(self, name):
+        album_id = uuid.uuid4().hex[:22]
+        # Looked up by id from the API and by name from add_track
+        album = {"id": album_id, "name": name, "images": [{"url": f"https://i.scdn.co/image/{album_id}"}], "tracks": []}
+        self.albums[album_id] = self.albums[name] = album
+        return album
+
+    def add_playlist(self, name, uris=()):
+        playlist_id = uuid.uuid4().hex[:22]
+        self.playlists[playlist_id] = list(uris)
+        self.playlist_names[playlist_id] = name
+        return playlist_id
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return error(401, "No token provided")
+        if self.failures:
+            status = self.failures.pop(0)
+            headers = {"Retry-After": str(self.retry_after)} if status == 429 else None
+            return error(status, "Injected failure", headers)
+        return await handler(request)
+
+    async def search(self, request):
+        query = request.query.get("q", "").lower()
+        limit = int(request.query.get("limit", 20))
+        items = [track for track in self.tracks.values() if query in f"{track['name']} {track['artists'][0]['name']}".lower()]
+        return web.json_response({"tracks": {"items": items[:limit], "total": len(items)}})
+
+    async def track(self, request):
+        track = self.tracks.get(request.match_info["track_id"])
+        if track is None:
+            return error(404, "Non existing id")
+        return web.json_response(track)
+
+    async def album(self, request):
+        album = self.albums.get(request.match_info["album_id"])
+        if album is None or album["id"] != request.match_info["album_id"]:
+            return error(404, "Non existing id")
+        tracks = [self.simplified(track_id) for track_id in album["tracks"]]
+        url = request.url.join(request.app.router["album_tracks"].url_for(album_id=album["id"]))
+        return web.json_response({**album, "tracks": page(url, tracks, 0, 50)})
+
+    async def album_tracks(self, request):
+        album = self.albums.get(request.match_info["album_id"])
+        if album is None:
+            return error(404, "Non existing id")
+        tracks = [self.simplified(track_id) for track_id in album["tracks"]]
+        return web.json_response(page(request.url, tracks, *limits(request, 50)))
+
+    def simplified(self, track_id):
+        # Album track listings leave the album out of each track
+        return {key: value for key, value in self.tracks[track_id].items() if key != "album"}
+
+    def playlist_items(self, playlist_id):
+        return [{"track": self.tracks.get(uri.rsplit(":", 1)[-1], {"uri": uri})} for uri in self.playlists[playlist_id]]
+
+    async def playlist(self, request):
+        playlist_id = request.match_info["playlist_id"]
+        if playlist_id not in self.playlists:
+            return error(404, "Not found.")
+        url = request.url.join(request.app.router["playlist_tracks"].url_for(playlist_id=playlist_id))
+        return web.json_response({
+            "id": playlist_id,
+            "name": self.playlist_names.get(playlist_id, playlist_id),
+            "images": [],
+            "tracks": page(url, self.playlist_items(playlist_id), 0, 100),
+        })
+
+    async def playlist_tracks(self, request):
+        playlist_id = request.match_info["playlist_id"]
+        if playlist_id not in self.playlists:
+            return error(404, "Not found.")
+        return web.json_response(page(request.url, self.playlist_items(playlist_id), *limits(request, 100)))
+
+    async def add_playlist_tracks(self, request):
+        uris = (await request.json()).get("uris", [])
+        if not uris or len(uris) > 100:
+            return error(400, "You can add a maximum of 100 tracks per request.")
+        self.adds += 1
+        self.playlists.setdefault(request.match_info["playlist_id"], []).extend(uris)
+        return web.json_response({"snapshot_id": uuid.uuid4().hex}, status=201)
+
+    def app(self):
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/v1/search", self.search)
+        app.router.add_get("/v1/tracks/{track_id}", self.track)
+        app.router.add_get("/v1/albums/{album_id}", self.album)
+        app.router.add_get("/v1/albums/{album_id}/tracks", self.album_tracks, name="album_tracks")
+        app.router.add_get("/v1/playlists/{playlist_id}", self.playlist)
+        app.router.add_get("/v1/playlists/{playlist_id}/tracks", self.playlist_tracks, name="playlist_tracks")
+        app.router.add_post("/v1/playlists/{playlist_id}/tracks", self.add_playlist_tracks)
+        return app
+
+
+def limits(request, max_limit):
+    """(offset, limit) query parameters of a paged request"""
+    return int(request.query.get("offset", 0)), min(int(request.query.get("limit", 20)), max_limit)
+
+
+def page(url, items, offset, limit):
+    """Paging object for items[offset:offset + limit], with a next link pointing back at url"""
+    end = offset + limit
+    next_url = str(url.update_query(offset=end, limit=limit)) if end < len(items) else None
+    return {"items": items[offset:end], "offset": offset, "limit": limit, "total": len(items), "next": next_url}
+
+
+def error(status, message, headers=None):
+    return web.json_response({"error": {"status": status, "message": message}}, status=status, headers=headers)
+
+
+async def start_fake_server(spotify=None, host="127.0.0.1", port=0):
+    """Serve `spotify` (a fresh FakeSpotify by default); returns (runner, api url, spotify)"""
+    spotify = spotify or FakeSpotify()
+    runner = web.AppRunner(spotify.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/v1", spotify
+
+
+if __name__ == "__main__":
+    web.run_app(FakeSpotify().app(), host="127.0.0.1", port=int(sys.argv[1]) if len(sys.argv) > 1 else 8889)
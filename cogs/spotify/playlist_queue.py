@@ -0,0 +1,122 @@
+import asyncio
+import time
+from cogs.spotify.spotify_client import MAX_ADD_ITEMS
+
+# Adds wait this long for others to join them, then go out together
+FLUSH_DELAY = 2
+# The playlist is re-read this often, to notice tracks added or removed outside the bot
+PLAYLIST_REFRESH = 10 * 60
+
+
+class _Batch:
+    __slots__ = ("uris", "future")
+
+    def __init__(self, uris, future):
+        self.uris = uris
+        self.future = future
+
+
+class PlaylistQueue:
+    """Appends tracks to a playlist in batches, without duplicates.
+
+    Tracks queued within FLUSH_DELAY seconds of each other are sent together,
+    MAX_ADD_ITEMS per API call, so a song-sharing spree costs a handful of
+    requests instead of one per song. Tracks already in the playlist or
+    already waiting to be added are skipped. The playlist's contents are read
+    once (and every PLAYLIST_REFRESH seconds) and otherwise tracked from our
+    own adds.
+    """
+
+    def __init__(self, sp, playlist_id, flush_delay=FLUSH_DELAY):
+        self.sp = sp
+        self.playlist_id = playlist_id
+        self.flush_delay = flush_delay
+        self.batches = []
+        self.queued = set()
+        self.known = None  # uris in the playlist
+        self.known_at = 0
+        self.known_lock = asyncio.Lock()
+        self.flush_lock = asyncio.Lock()
+        self.flusher = None
+        self.calls = 0
+        self.added = 0
+        self.skipped = 0
+
+    async def playlist_uris(self):
+        async with self.known_lock:
+            if self.known is None or time.monotonic() - self.known_at > PLAYLIST_REFRESH:
+                self.known = set(await self.sp.playlist_uris(self.playlist_id))
+                self.known_at = time.monotonic()
+            return self.known
+
+    async def add(self, uris):
+        """Queue tracks and wait until they are in the playlist; returns (added uris, skipped uris)"""
+        known = await self.playlist_uris()
+        added, skipped = [], []
+        for uri in uris:
+            if uri in known or uri in self.queued:
+                skipped.append(uri)
+            else:
+                added.append(uri)
+                self.queued.add(uri)
+        self.skipped += len(skipped)
+        if not added:
+            return added, skipped
+
+        loop = asyncio.get_running_loop()
+        batch = _Batch(added, loop.create_future())
+        self.batches.append(batch)
+        if self.flusher is None:
+            self.flusher = loop.create_task(self._flush_later())
+        await asyncio.shield(batch.future)
+        return added, skipped
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_delay)
+        # Anything queued from here on starts the next batch
+        self.flusher = None
+        await self.flush()
+
+    async def flush(self):
+        """Send everything queued now; each batch's future resolves, or fails, once its tracks are sent"""
+        async with self.flush_lock:
+            batches, self.batches = self.batches, []
+            uris = [uri for batch in batches for uri in batch.uris]
+            errors = {}
+            for start in range(0, len(uris), MAX_ADD_ITEMS):
+                chunk = uris[start:start + MAX_ADD_ITEMS]
+                try:
+                    await self.sp.playlist_add_items(self.playlist_id, chunk)
+                except Exception as e:
+                    errors.update(dict.fromkeys(chunk, e))
+                else:
+                    self.calls += 1
+                    self.added += len(chunk)
+                    self.known.update(chunk)
+                self.queued.difference_update(chunk)
+
+            for batch in batches:
+                if batch.future.done():
+                    continue
+                error = next((errors[uri] for uri in batch.uris if uri in errors), None)
+                if error is not None:
+                    batch.future.set_exception(error)
+                else:
+                    batch.future.set_result(None)
+
+    async def close(self):
+        """Send whatever is still waiting right away"""
+        if self.flusher is not None:
+            self.flusher.cancel()
+            self.flusher = None
+        if self.batches:
+            await self.flush()
+
+    def stats(self):
+        """Tracks waiting and lifetime counters"""
+        return {
+            "queued": len(self.queued),
+            "added": self.added,
+            "calls": self.calls,
+            "skipped": self.skipped,
+        }
@@ -1,7 +1,11 @@
 # spotify.py
 import discord
 from discord.ext import commands
-from cogs.spotify.spotify_auth import get_spotify_client
+from cogs.spotify.spotify_auth import get_auth_manager, get_token
+from cogs.spotify.spotify_client import SpotifyClient
+from cogs.spotify.playlist_queue import PlaylistQueue
+from utils.cache import TTLCache
+from functools import partial
 import re
 import asyncio
 import traceback
@@ -11,11 +15,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 PLAYLIST_ID = os.getenv('SPOTIFY_PLAYLIST')
+# Searches always ask for this many results so !search and !addsong share cache entries
+SEARCH_LIMIT = 5
+# Search results go stale as the catalogue changes, track metadata barely ever does
+SEARCH_CACHE_SIZE = 500
+SEARCH_TTL = 15 * 60
+TRACK_CACHE_SIZE = 2000
+TRACK_TTL = 24 * 60 * 60
+# Track, album or playlist links (https://open.spotify.com/album/... or spotify:album:...)
+LINK_PATTERN = re.compile(r'(?:https?://open\.spotify\.com/(?:intl-[a-z-]+/)?|spotify:)(track|album|playlist)[/:]([a-zA-Z0-9]+)', re.IGNORECASE)
 
 class SpotifyCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.sp = None
+        self.queue = None
+        self.searches = TTLCache(SEARCH_CACHE_SIZE, SEARCH_TTL)  # normalized query -> tracks
+        self.tracks = TTLCache(TRACK_CACHE_SIZE, TRACK_TTL)  # track id -> track
         # Initialize Spotify in the background to avoid blocking
         self.bot.loop.create_task(self.initialize_spotify())
         print("Spotify cog loaded")
@@ -24,7 +40,9 @@ class SpotifyCog(commands.Cog):
         """Initialize Spotify client in the background"""
         try:
             # Run the Spotify authentication in a separate thread to avoid blocking
-            self.sp = await self.bot.loop.run_in_executor(None, get_spotify_client)
+            auth_manager = await self.bot.loop.run_in_executor(None, get_auth_manager)
+            self.sp = SpotifyClient(partial(get_token, auth_manager))
+            self.queue = PlaylistQueue(self.sp, PLAYLIST_ID)
             print("Spotify client initialized successfully")
         except Exception as e:
             print(f"Failed to initialize Spotify: {e}")
@@ -37,35 +55,60 @@ class SpotifyCog(commands.Cog):
             if self.sp is None:
                 raise Exception("Spotify client not initialized. Please check authentication.")
         return self.sp
-            
+
+    async def cog_unload(self):
+        if self.queue is not None:
+            await self.queue.close()
+        if self.sp is not None:
+            await self.sp.close()
+
+    async def search_tracks(self, sp, query):
+        """Top SEARCH_LIMIT tracks for a query, cached by its lowercased, whitespace-collapsed form"""
+        key = " ".join(query.lower().split())
+
+        async def search():
+            result = await sp.search(key, limit=SEARCH_LIMIT)
+            items = result['tracks']['items']
+            # Anything found is likely to be added next, so remember it as a track too
+            for track in items:
+                self.tracks.put(track['id'], track)
+            return items
+
+        return await self.searches.fetch(key, search)
+
+    async def get_track(self, sp, track_id):
+        return await self.tracks.fetch(track_id, partial(sp.track, track_id))
 
     @commands.command(name="addsong")
     async def add_song(self, ctx, *, query: str):
-        """Adds a song to the Spotify playlist. Accepts search terms or a Spotify track link."""
+        """Adds a song to the Spotify playlist. Accepts search terms or a Spotify track, album or playlist link."""
         try:
             # Get Spotify client
             sp = await self.ensure_spotify_client()
 
             # Show "typing" indicator while processing
             async with ctx.typing():
-                # Check if query is a Spotify track URL or URI
-                match = re.match(r'(https?://open\.spotify\.com/track/|spotify:track:)([a-zA-Z0-9]+)', query)
+                # Check if query is a Spotify link or URI
+                match = LINK_PATTERN.match(query.strip())
+                if match and match.group(1).lower() != 'track':
+                    await self.add_collection(ctx, sp, match.group(1).lower(), match.group(2))
+                    return
                 if match:
-                    track_id = match.group(2)
-                    uri = f"spotify:track:{track_id}"
                     # Get track details
-                    track = sp.track(uri)
+                    track = await self.get_track(sp, match.group(2))
                 else:
                     # Perform search
-                    result = sp.search(q=query, type='track', limit=1)
-                    if not result['tracks']['items']:
+                    items = await self.search_tracks(sp, query)
+                    if not items:
                         await ctx.send("❌ No song found with that query. Try with more specific search terms.")
                         return
-                    track = result['tracks']['items'][0]
-                    uri = track['uri']
+                    track = items[0]
 
-                # Add the track to the playlist
-                sp.playlist_add_items(PLAYLIST_ID, [uri])
+                # Queue the track, this returns once its batch is in the playlist
+                added, _ = await self.queue.add([track['uri']])
+                if not added:
+                    await ctx.send(f"ℹ️ **{track['name']}** is already in the playlist.")
+                    return
 
                 # Create an embed for better display
                 embed = discord.Embed(
@@ -86,6 +129,37 @@ class SpotifyCog(commands.Cog):
             await ctx.send(f"❌ Error: {str(e)}")
             traceback.print_exc()
 
+    async def add_collection(self, ctx, sp, kind, collection_id):
+        """Queue every track of an album or playlist and confirm once they land"""
+        if kind == 'album':
+            collection = await sp.album(collection_id)
+            tracks = await sp.all_items(collection['tracks'])
+        else:
+            collection = await sp.playlist(collection_id)
+            tracks = [item['track'] for item in await sp.all_items(collection['tracks']) if item.get('track')]
+
+        # Local files and podcast episodes can't be added by URI
+        uris = [track['uri'] for track in tracks if track['uri'].startswith('spotify:track:')]
+        if not uris:
+            await ctx.send(f"❌ That {kind} has no songs that can be added.")
+            return
+
+        added, skipped = await self.queue.add(uris)
+        if not added:
+            await ctx.send(f"ℹ️ Every song from **{collection['name']}** is already in the playlist.")
+            return
+
+        embed = discord.Embed(
+            title="✅ Songs Added",
+            description=f"Added {len(added)} songs from the {kind} **{collection['name']}**",
+            color=0x1DB954  # Spotify green
+        )
+        if skipped:
+            embed.add_field(name="Skipped", value=f"{len(skipped)} already in the playlist", inline=True)
+        if collection.get('images'):
+            embed.set_thumbnail(url=collection['images'][0]['url'])
+        await ctx.send(embed=embed)
+
     @commands.command(name="playlist")
     async def list_songs(self, ctx):
         await ctx.send("https://open.spotify.com/playlist/1R2zNS22jWAEsfeJWUiqyk?si=5d3eba2d4df04a26")
@@ -100,9 +174,9 @@ class SpotifyCog(commands.Cog):
             # Show "typing" indicator while processing
             async with ctx.typing():
                 # Search for the track
-                result = sp.search(q=query, type='track', limit=5)
+                items = await self.search_tracks(sp, query)
                 
-                if not result['tracks']['items']:
+                if not items:
                     await ctx.send("❌ No songs found with that query.")
                     return
                     
@@ -113,7 +187,7 @@ class SpotifyCog(commands.Cog):
                 )
                 
                 # Add top 5 results
-                for i, track in enumerate(result['tracks']['items'], 1):
+                for i, track in enumerate(items, 1):
                     artists = ", ".join([artist['name'] for artist in track['artists']])
                     embed.add_field(
                         name=f"{i}. {track['name']}", 
@@ -126,5 +200,25 @@ class SpotifyCog(commands.Cog):
             await ctx.send(f"❌ Error: {str(e)}")
             traceback.print_exc()
 
+    @commands.command(name="spotifystats")
+    async def spotify_stats(self, ctx):
+        """Shows how well the Spotify lookup caches and the playlist queue are doing"""
+        lines = ["**Spotify caches:**"]
+        for name, cache in (("Searches", self.searches), ("Tracks", self.tracks)):
+            stats = cache.stats()
+            lookups = stats['hits'] + stats['misses']
+            hit_rate = stats['hits'] / lookups * 100 if lookups else 0
+            lines.append(
+                f"{name}: {stats['size']}/{stats['maxsize']} cached • {stats['hits']} hits / {stats['misses']} misses "
+                f"({hit_rate:.0f}%) • {stats['shared']} shared in-flight"
+            )
+        if self.queue is not None:
+            stats = self.queue.stats()
+            lines.append(
+                f"**Playlist adds:** {stats['added']} songs in {stats['calls']} requests • "
+                f"{stats['skipped']} duplicates skipped • {stats['queued']} waiting"
+            )
+        await ctx.send("\n".join(lines))
+
 async def setup(bot):
     await bot.add_cog(SpotifyCog(bot))
\ No newline at end of file
@@ -1,4 +1,3 @@
-from spotipy import Spotify
 from spotipy.oauth2 import SpotifyPKCE
 import os
 from dotenv import load_dotenv
@@ -10,7 +9,7 @@ REDIRECT_URI = "http://localhost:8888/callback"
 SCOPE = "playlist-modify-public playlist-modify-private"
 CACHE_PATH = "token_cache.json"
 
-def get_spotify_client():
+def get_auth_manager():
     auth_manager = SpotifyPKCE(
         client_id=CLIENT_ID,
         redirect_uri=REDIRECT_URI,
@@ -20,9 +19,24 @@ def get_spotify_client():
     )
 
     # This triggers token fetching/refresh if needed
-    token = auth_manager.get_access_token()
+    get_token(auth_manager)
+    return auth_manager
+
+def get_token(auth_manager, force=False):
+    """(access token, expiry as a unix timestamp), refreshing the cached token if it has expired.
 
+    With force, the token is refreshed even if spotipy still thinks it is
+    valid, for when Spotify has rejected it. Blocking: spotipy refreshes over
+    plain requests, so call this from an executor.
+    """
+    cached = auth_manager.get_cached_token()
+    if force and cached and cached.get("refresh_token"):
+        token_info = auth_manager.refresh_access_token(cached["refresh_token"])
+        return token_info["access_token"], token_info["expires_at"]
+
+    token = auth_manager.get_access_token()
     if not token:
         raise Exception("Failed to obtain a Spotify access token.")
 
-    return Spotify(auth_manager=auth_manager)
+    token_info = auth_manager.get_cached_token()
+    return token, token_info["expires_at"]
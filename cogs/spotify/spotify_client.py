@@ -0,0 +1,170 @@
+import aiohttp
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+API_URL = "https://api.spotify.com/v1"
+# Connections kept open to the API, shared by every command
+MAX_CONNECTIONS = 10
+# Seconds a single request may take, including reading the response
+REQUEST_TIMEOUT = 10
+# Retries after a 429, a 5xx or a network error, waiting BACKOFF_BASE * 2^attempt (plus jitter) in between
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+# Never sleep longer than this on a Retry-After, the command would look dead anyway
+MAX_RETRY_AFTER = 30
+# Refresh the access token this many seconds before Spotify says it expires
+TOKEN_MARGIN = 60
+# Most tracks the API accepts in one playlist add
+MAX_ADD_ITEMS = 100
+
+
+class SpotifyError(Exception):
+    """The Spotify API answered with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(f"Spotify API error {status}: {message}")
+        self.status = status
+
+
+class SpotifyClient:
+    """Async client for the parts of the Spotify Web API the bot uses.
+
+    All requests go through one aiohttp session, so connections are pooled
+    and concurrent commands overlap instead of blocking the event loop the
+    way spotipy does. `token_provider(force)` is a blocking callable
+    returning (access token, expires_at); it only runs, in an executor, when
+    the current token is about to expire, or with force=True when Spotify
+    rejected a token it still considered valid. Point `api_url` at
+    cogs/spotify/fake_server.py to run without Spotify.
+    """
+
+    def __init__(self, token_provider, api_url=API_URL, max_retries=MAX_RETRIES, timeout=REQUEST_TIMEOUT):
+        self.token_provider = token_provider
+        self.api_url = api_url.rstrip("/")
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self.token = None
+        self.expires_at = 0
+        self.token_lock = asyncio.Lock()
+
+    def _session(self):
+        # Created lazily so the session belongs to the running loop
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS),
+                timeout=self.timeout,
+            )
+        return self.session
+
+    async def access_token(self, rejected=None):
+        """A usable access token; pass the token Spotify just answered 401 to in `rejected` to force a refresh"""
+        if rejected is None and self.token is not None and time.time() < self.expires_at - TOKEN_MARGIN:
+            return self.token
+        async with self.token_lock:
+            # Another request may have refreshed it while we waited
+            force = rejected is not None and self.token == rejected
+            if force or self.token is None or time.time() >= self.expires_at - TOKEN_MARGIN:
+                loop = asyncio.get_running_loop()
+                self.token, self.expires_at = await loop.run_in_executor(None, self.token_provider, force)
+            return self.token
+
+    def backoff(self, attempt):
+        return BACKOFF_BASE * 2 ** attempt + random.uniform(0, BACKOFF_BASE)
+
+    def retry_after(self, response, attempt):
+        """Seconds to wait after a 429: its Retry-After (in seconds or as an HTTP date) or else the usual backoff"""
+        header = response.headers.get("Retry-After")
+        if header is None:
+            return self.backoff(attempt)
+        try:
+            delay = float(header)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(header).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return self.backoff(attempt)
+        if delay != delay:  # NaN
+            return self.backoff(attempt)
+        return min(max(delay, 0), MAX_RETRY_AFTER)
+
+    async def request(self, method, path, params=None, json=None):
+        """Decoded JSON body of an API call (None for empty responses), retrying transient failures"""
+        # Paging objects hand out absolute "next" urls
+        url = path if path.startswith("http") else f"{self.api_url}/{path.lstrip('/')}"
+        rejected = None
+        for attempt in range(self.max_retries + 1):
+            retry = attempt < self.max_retries
+            token = await self.access_token(rejected)
+            rejected = None
+            headers = {"Authorization": f"Bearer {token}"}
+            try:
+                async with self._session().request(method, url, params=params, json=json, headers=headers) as response:
+                    # Retries only note how long to wait: sleeping in here would keep the
+                    # pooled connection checked out for the whole wait
+                    if response.status == 429 and retry:
+                        delay = self.retry_after(response, attempt)
+                    elif response.status >= 500 and retry:
+                        delay = self.backoff(attempt)
+                    elif response.status == 401 and retry:
+                        # The token was revoked or expired early; spotipy would hand the
+                        # same one back while it looks valid, so force a refresh
+                        rejected = token
+                        continue
+                    elif response.status >= 400:
+                        raise SpotifyError(response.status, await self.error_message(response))
+                    elif response.status == 204 or response.content_length == 0:
+                        return None
+                    else:
+                        return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not retry:
+                    raise
+                delay = self.backoff(attempt)
+            await asyncio.sleep(delay)
+
+    async def error_message(self, response):
+        try:
+            body = await response.json()
+            return body["error"]["message"]
+        except (aiohttp.ContentTypeError, ValueError, KeyError, TypeError):
+            return response.reason
+
+    async def search(self, query, limit=1):
+        """Track search, shaped like spotipy's search(q, type='track')"""
+        return await self.request("GET", "search", params={"q": query, "type": "track", "limit": limit})
+
+    async def track(self, track_id):
+        return await self.request("GET", f"tracks/{track_id}")
+
+    async def album(self, album_id):
+        """Album with the first page of its (simplified) tracks"""
+        return await self.request("GET", f"albums/{album_id}")
+
+    async def playlist(self, playlist_id):
+        """Playlist with the first page of its items"""
+        return await self.request("GET", f"playlists/{playlist_id}")
+
+    async def playlist_uris(self, playlist_id):
+        """URIs of everything in a playlist, fetched 100 at a time"""
+        page = await self.request("GET", f"playlists/{playlist_id}/tracks", params={"limit": 100, "fields": "items(track(uri)),next"})
+        return [item["track"]["uri"] for item in await self.all_items(page) if item.get("track")]
+
+    async def all_items(self, page):
+        """Every item of a paging object, following its next links"""
+        items = list(page["items"])
+        while page.get("next"):
+            page = await self.request("GET", page["next"])
+            items.extend(page["items"])
+        return items
+
+    async def playlist_add_items(self, playlist_id, uris):
+        if len(uris) > MAX_ADD_ITEMS:
+            raise ValueError(f"At most {MAX_ADD_ITEMS} tracks can be added per request")
+        return await self.request("POST", f"playlists/{playlist_id}/tracks", json={"uris": uris})
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
@@ -1,30 +1,131 @@
 import discord
 from discord.ext import commands
-import sqlite3
-import asyncio
 from datetime import datetime
+from utils.database import get_database
+from utils.migrations import rebuild_table
+from utils.cache import LRUCache
+from cogs.tower.tower_stats import tower_stats
 
-# Connect to a dedicated database for the tower
-conn = sqlite3.connect("tower.db")
-c = conn.cursor()
+FLOORS_PER_PAGE = 10
+# Rendered !tower pages kept around for repeat page flips
+PAGE_CACHE_SIZE = 256
 
-# Create tower floors table if it doesn't exist
-c.execute("""
-CREATE TABLE IF NOT EXISTS tower_floors (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    floor_number INTEGER UNIQUE,
-    floor_name TEXT,
-    floor_description TEXT,
-    added_by_id INTEGER,
-    added_by_name TEXT,
-    added_at TIMESTAMP
-)
-""")
-conn.commit()
+FLOOR_COLUMNS = ["id", "floor_number", "floor_name", "floor_description", "added_by_id", "added_by_name", "added_at"]
+
+def convert_added_at(conn):
+    """Store added_at as integer epoch seconds instead of datetime text"""
+    def convert(row):
+        added_at = row[-1]
+        if added_at is not None:
+            added_at = int(datetime.fromisoformat(added_at).timestamp())
+        return (*row[:-1], added_at)
+    
+    rebuild_table(conn, "tower_floors", """
+    CREATE TABLE tower_floors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        floor_number INTEGER UNIQUE,
+        floor_name TEXT,
+        floor_description TEXT,
+        added_by_id INTEGER,
+        added_by_name TEXT,
+        added_at INTEGER
+    )
+    """, FLOOR_COLUMNS, convert)
+    conn.execute("CREATE INDEX idx_tower_floors_added_by ON tower_floors (added_by_id)")
+
+# Schema history of tower.db (a dedicated database for the tower), applied in order by Database.migrate
+MIGRATIONS = [
+    (1, [
+        """
+        CREATE TABLE IF NOT EXISTS tower_floors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            floor_number INTEGER UNIQUE,
+            floor_name TEXT,
+            floor_description TEXT,
+            added_by_id INTEGER,
+            added_by_name TEXT,
+            added_at TIMESTAMP
+        )
+        """,
+    ]),
+    (2, convert_added_at),
+    # Per-contributor floor counts, kept up to date by !toweradd so stats never aggregate the floors table
+    (3, [
+        """
+        CREATE TABLE tower_contributors (
+            added_by_id INTEGER PRIMARY KEY,
+            added_by_name TEXT,
+            floor_count INTEGER NOT NULL
+        )
+        """,
+        """
+        INSERT INTO tower_contributors (added_by_id, added_by_name, floor_count)
+        SELECT added_by_id, MAX(added_by_name), COUNT(*) FROM tower_floors GROUP BY added_by_id
+        """,
+    ]),
+    # Full-text index for !towersearch, kept in sync with tower_floors by triggers and backfilled by 'rebuild'
+    (4, [
+        """
+        CREATE VIRTUAL TABLE tower_floors_fts USING fts5(
+            floor_name, floor_description, added_by_name,
+            content='tower_floors', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER tower_floors_fts_insert AFTER INSERT ON tower_floors BEGIN
+            INSERT INTO tower_floors_fts (rowid, floor_name, floor_description, added_by_name)
+            VALUES (new.id, new.floor_name, new.floor_description, new.added_by_name);
+        END
+        """,
+        """
+        CREATE TRIGGER tower_floors_fts_delete AFTER DELETE ON tower_floors BEGIN
+            INSERT INTO tower_floors_fts (tower_floors_fts, rowid, floor_name, floor_description, added_by_name)
+            VALUES ('delete', old.id, old.floor_name, old.floor_description, old.added_by_name);
+        END
+        """,
+        """
+        CREATE TRIGGER tower_floors_fts_update AFTER UPDATE ON tower_floors BEGIN
+            INSERT INTO tower_floors_fts (tower_floors_fts, rowid, floor_name, floor_description, added_by_name)
+            VALUES ('delete', old.id, old.floor_name, old.floor_description, old.added_by_name);
+            INSERT INTO tower_floors_fts (rowid, floor_name, floor_description, added_by_name)
+            VALUES (new.id, new.floor_name, new.floor_description, new.added_by_name);
+        END
+        """,
+        "INSERT INTO tower_floors_fts (tower_floors_fts) VALUES ('rebuild')",
+    ]),
+]
+
+# Floors returned by !towersearch
+SEARCH_RESULTS = 10
+# Discord rejects embeds whose title or field names run past this
+EMBED_TITLE_LIMIT = 256
+# ... or whose field values run past this
+EMBED_VALUE_LIMIT = 1024
+
+def shorten(text, limit):
+    """Cut text down to limit characters, ending it with ... when it was too long"""
+    if len(text) > limit:
+        text = text[:limit - 3] + "..."
+    return text
+
+def build_search_query(terms):
+    """Turn free text into an FTS5 query that matches floors containing every word.
+    
+    Each word is quoted so punctuation in user input can't be parsed as FTS5 syntax.
+    """
+    words = terms.split()
+    return " ".join('"' + word.replace('"', '""') + '"' for word in words)
 
 class Tower(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.db = get_database("tower.db")
+        self.page_cache = LRUCache(PAGE_CACHE_SIZE)
+
+    async def cog_load(self):
+        await self.db.migrate(MIGRATIONS)
+        await tower_stats.load(self.db)
         
     @commands.command(name="toweradd", aliases=["tnf", "addfloor"])
     async def tower_new_floor(self, ctx, *, floor_data=None):
@@ -38,18 +139,26 @@ class Tower(commands.Cog):
         floor_name = parts[0].strip()
         floor_description = parts[1].strip() if len(parts) > 1 else "No description provided."
             
-        # Get the next floor number
-        c.execute("SELECT MAX(floor_number) FROM tower_floors")
-        result = c.fetchone()
-        next_floor = 1 if result[0] is None else result[0] + 1
-        
-        # Add the new floor
-        c.execute("""
-        INSERT INTO tower_floors (floor_number, floor_name, floor_description, added_by_id, added_by_name, added_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """, (next_floor, floor_name, floor_description, ctx.author.id, ctx.author.display_name, datetime.now()))
+        # Get the next floor number and add the new floor in one write transaction
+        def add_floor(conn):
+            result = conn.execute("SELECT MAX(floor_number) FROM tower_floors").fetchone()
+            next_floor = 1 if result[0] is None else result[0] + 1
+            
+            conn.execute("""
+            INSERT INTO tower_floors (floor_number, floor_name, floor_description, added_by_id, added_by_name, added_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """, (next_floor, floor_name, floor_description, ctx.author.id, ctx.author.display_name, int(datetime.now().timestamp())))
+            conn.execute("""
+            INSERT INTO tower_contributors (added_by_id, added_by_name, floor_count)
+            VALUES (?, ?, 1)
+            ON CONFLICT(added_by_id) DO UPDATE SET added_by_name = excluded.added_by_name, floor_count = floor_count + 1
+            """, (ctx.author.id, ctx.author.display_name))
+            return next_floor
         
-        conn.commit()
+        next_floor = await self.db.transaction(add_floor)
+        tower_stats.record_floor(next_floor, floor_name, ctx.author.id, ctx.author.display_name)
+        # Every page shifts down when a floor is added on top
+        self.page_cache.clear()
         
         # Create an embed for the response
         embed = discord.Embed(
@@ -63,37 +172,29 @@ class Tower(commands.Cog):
         
         await ctx.send(embed=embed)
         
-    @commands.command(name="tower", aliases=["showtower", "viewtower"])
-    async def show_tower(self, ctx, page: int = 1):
-        """Display the tower floors with pagination"""
-        # Get the total number of floors
-        c.execute("SELECT COUNT(*) FROM tower_floors")
-        total_floors = c.fetchone()[0]
-        
-        if total_floors == 0:
-            await ctx.send("The tower hasn't been built yet! Use `!towernewfloor [name] | [description]` to add the first floor.")
-            return
-            
-        # Calculate pagination
-        floors_per_page = 10
-        max_pages = (total_floors + floors_per_page - 1) // floors_per_page
+    async def get_tower_page(self, page):
+        """Return the embed for one page of the tower, rendering it only on a cache miss"""
+        total_floors = tower_stats.total_floors
+        highest_floor = tower_stats.highest_floor
+        # Keyed by the tower's current shape, so pages of an older tower are never served
+        key = (page, highest_floor, total_floors)
+        cached = self.page_cache.get(key)
+        if cached is not None:
+            return cached
         
-        # Validate page number
-        if page < 1 or page > max_pages:
-            page = 1
-            
-        # Calculate offset
-        offset = (page - 1) * floors_per_page
+        max_pages = (total_floors + FLOORS_PER_PAGE - 1) // FLOORS_PER_PAGE
         
-        # Get floor data for the requested page
-        c.execute("""
+        # Pages count down from the top floor. Floors are numbered MAX+1 and never deleted,
+        # so a page's top floor follows from its number and the page is a range seek on the
+        # floor_number index, whichever page is asked for first
+        top = highest_floor - (page - 1) * FLOORS_PER_PAGE
+        floors = await self.db.query("""
         SELECT floor_number, floor_name, floor_description, added_by_name 
         FROM tower_floors
+        WHERE floor_number <= ?
         ORDER BY floor_number DESC
-        LIMIT ? OFFSET ?
-        """, (floors_per_page, offset))
-        
-        floors = c.fetchall()
+        LIMIT ?
+        """, (top, FLOORS_PER_PAGE))
         
         # Create an embed for the tower display
         embed = discord.Embed(
@@ -111,70 +212,37 @@ class Tower(commands.Cog):
         embed.add_field(name="Floors", value=tower_text if tower_text else "No floors found", inline=False)
         embed.set_footer(text=f"Page {page}/{max_pages} • Use !tower [page] to view more floors")
         
-        # Add navigation buttons
-        message = await ctx.send(embed=embed)
+        self.page_cache.put(key, embed)
+        return embed
         
-        # Only add reaction controls if there are multiple pages
-        if max_pages > 1:
-            await message.add_reaction("⬅️")
-            await message.add_reaction("➡️")
+    @commands.command(name="tower", aliases=["showtower", "viewtower"])
+    async def show_tower(self, ctx, page: int = 1):
+        """Display the tower floors with pagination"""
+        # Get the total number of floors
+        total_floors = tower_stats.total_floors
+        
+        if total_floors == 0:
+            await ctx.send("The tower hasn't been built yet! Use `!towernewfloor [name] | [description]` to add the first floor.")
+            return
             
-            def check(reaction, user):
-                return user == ctx.author and str(reaction.emoji) in ["⬅️", "➡️"] and reaction.message.id == message.id
-                
-            while True:
-                try:
-                    reaction, user = await self.bot.wait_for("reaction_add", timeout=60.0, check=check)
-                    
-                    if str(reaction.emoji) == "⬅️" and page > 1:
-                        page -= 1
-                    elif str(reaction.emoji) == "➡️" and page < max_pages:
-                        page += 1
-                    else:
-                        await message.remove_reaction(reaction, user)
-                        continue
-                        
-                    # Recalculate offset
-                    offset = (page - 1) * floors_per_page
-                    
-                    # Get new floor data
-                    c.execute("""
-                    SELECT floor_number, floor_name, floor_description, added_by_name 
-                    FROM tower_floors
-                    ORDER BY floor_number DESC
-                    LIMIT ? OFFSET ?
-                    """, (floors_per_page, offset))
-                    
-                    floors = c.fetchall()
-                    
-                    # Update embed
-                    tower_text = ""
-                    for floor in floors:
-                        floor_num, name, description, added_by = floor
-                        tower_text += f"**Floor {floor_num}:** {name} (Added by {added_by})\n"
-                        
-                    embed.clear_fields()
-                    embed.add_field(name="Floors", value=tower_text if tower_text else "No floors found", inline=False)
-                    embed.set_footer(text=f"Page {page}/{max_pages} • Use !tower [page] to view more floors")
-                    
-                    await message.edit(embed=embed)
-                    await message.remove_reaction(reaction, user)
-                    
-                except asyncio.TimeoutError:
-                    await message.clear_reactions()
-                    break
+        # Calculate pagination
+        max_pages = (total_floors + FLOORS_PER_PAGE - 1) // FLOORS_PER_PAGE
+        
+        # Validate page number
+        if page < 1 or page > max_pages:
+            page = 1
+            
+        await self.bot.get_cog("Paginator").start(ctx, self.get_tower_page, max_pages, page)
     
     @commands.command(name="towerinfo", aliases=["floorinfo"])
     async def tower_floor_info(self, ctx, floor_number: int):
         """Get detailed information about a specific floor"""
-        c.execute("""
+        floor = await self.db.query_one("""
         SELECT floor_number, floor_name, floor_description, added_by_name, added_at
         FROM tower_floors
         WHERE floor_number = ?
         """, (floor_number,))
         
-        floor = c.fetchone()
-        
         if not floor:
             await ctx.send(f"Floor #{floor_number} doesn't exist yet! The highest floor is currently {self.get_highest_floor()}.")
             return
@@ -182,7 +250,7 @@ class Tower(commands.Cog):
         floor_num, name, description, added_by, added_at = floor
         
         # Format the timestamp
-        timestamp = datetime.strptime(added_at, "%Y-%m-%d %H:%M:%S.%f")
+        timestamp = datetime.fromtimestamp(added_at)
         formatted_time = timestamp.strftime("%B %d, %Y at %H:%M")
         
         # Create an embed for floor info
@@ -205,44 +273,33 @@ class Tower(commands.Cog):
     #        return
     #        
     #    # Check if the floor exists
-    #    c.execute("SELECT added_by_id FROM tower_floors WHERE floor_number = ?", (floor_number,))
-    #    result = c.fetchone()
+    #    result = await self.db.query_one("SELECT added_by_id FROM tower_floors WHERE floor_number = ?", (floor_number,))
     #    
     #    if not result:
     #        await ctx.send(f"Floor #{floor_number} doesn't exist!")
     #        return
     #    
     #    # Update the floor description
-    #    c.execute("""
+    #    await self.db.execute("""
     #    UPDATE tower_floors
     #    SET floor_description = ?
     #    WHERE floor_number = ?
     #    """, (new_description, floor_number))
     #    
-    #    conn.commit()
-    #    
     #    await ctx.send(f"Floor #{floor_number}'s description has been updated!")
         
     @commands.command(name="towerstats")
     async def tower_stats(self, ctx):
         """Display statistics about the tower"""
         # Get total floors
-        c.execute("SELECT COUNT(*) FROM tower_floors")
-        total_floors = c.fetchone()[0]
+        total_floors = tower_stats.total_floors
         
         if total_floors == 0:
             await ctx.send("The tower hasn't been built yet! Use `!towernewfloor [name] | [description]` to add the first floor.")
             return
             
         # Get top contributors
-        c.execute("""
-        SELECT added_by_name, COUNT(*) as floor_count
-        FROM tower_floors
-        GROUP BY added_by_id
-        ORDER BY floor_count DESC
-        LIMIT 5
-        """)
-        top_contributors = c.fetchall()
+        top_contributors = tower_stats.top_contributors(5)
         
         # Create an embed for stats
         embed = discord.Embed(
@@ -260,11 +317,8 @@ class Tower(commands.Cog):
         embed.add_field(name="Top Contributors", value=contributors_text if contributors_text else "No contributors yet", inline=False)
         
         # Get the first and most recent floor
-        c.execute("SELECT floor_number, floor_name, added_by_name FROM tower_floors ORDER BY floor_number ASC LIMIT 1")
-        first_floor = c.fetchone()
-        
-        c.execute("SELECT floor_number, floor_name, added_by_name FROM tower_floors ORDER BY floor_number DESC LIMIT 1")
-        newest_floor = c.fetchone()
+        first_floor = tower_stats.first_floor
+        newest_floor = tower_stats.newest_floor
         
         if first_floor:
             embed.add_field(name="Foundation (Floor #1)", value=f"**{first_floor[1]}** added by {first_floor[2]}", inline=True)
@@ -274,11 +328,47 @@ class Tower(commands.Cog):
             
         await ctx.send(embed=embed)
     
+    @commands.command(name="towersearch", aliases=["searchtower", "findfloor"])
+    async def tower_search(self, ctx, *, terms: str = None):
+        """Search floor names, descriptions and builders - !towersearch <terms>"""
+        query = build_search_query(terms or "")
+        if not query:
+            await ctx.send(f"{ctx.author.mention}, tell me what to look for! Format: `!towersearch <terms>`")
+            return
+        
+        # Best matches first, weighting the floor name above the description and builder.
+        # The snippet comes from whichever column matched best
+        results = await self.db.query("""
+        SELECT f.floor_number, f.floor_name, f.added_by_name,
+               snippet(tower_floors_fts, -1, '**', '**', '…', 12)
+        FROM tower_floors_fts
+        JOIN tower_floors AS f ON f.id = tower_floors_fts.rowid
+        WHERE tower_floors_fts MATCH ?
+        ORDER BY bm25(tower_floors_fts, 10.0, 2.0, 1.0)
+        LIMIT ?
+        """, (query, SEARCH_RESULTS))
+        
+        if not results:
+            await ctx.send(f"No floors match `{terms}`.")
+            return
+        
+        embed = discord.Embed(
+            title=shorten(f"Tower search: {terms}", EMBED_TITLE_LIMIT),
+            color=0x3498db
+        )
+        for floor_num, name, added_by, snippet in results:
+            embed.add_field(
+                name=shorten(f"Floor {floor_num}: {name}", EMBED_TITLE_LIMIT),
+                value=shorten(f"{snippet}\n*Added by {added_by}*", EMBED_VALUE_LIMIT),
+                inline=False
+            )
+        embed.set_footer(text="Use !towerinfo <floor number> for the full floor")
+        
+        await ctx.send(embed=embed)
+    
     def get_highest_floor(self):
         """Helper method to get the highest floor number"""
-        c.execute("SELECT MAX(floor_number) FROM tower_floors")
-        result = c.fetchone()
-        return result[0] if result[0] is not None else 0
+        return tower_stats.highest_floor
 
 # Function to setup the cog
 def setup(bot):
@@ -0,0 +1,417 @@
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import random
+from utils.encoding import encode_image, DEFAULT_PRESET
+
+
+# Image dimensions and settings
+WIDTH = 800
+HEIGHT = 1200
+
+# Breakcore color palette - vibrant, contrasting colors
+BG_COLOR = (0, 0, 0)  # Black background
+NEON_COLORS = [
+    (255, 0, 255),    # Magenta
+    (0, 255, 255),    # Cyan 
+    (255, 255, 0),    # Yellow
+    (0, 255, 0),      # Green
+    (255, 0, 0),      # Red
+    (0, 0, 255)       # Blue
+]
+
+# Tower dimensions
+TOWER_WIDTH = 300
+TOWER_HEIGHT = 800
+TOWER_X = (WIDTH - TOWER_WIDTH) // 2
+TOWER_Y = HEIGHT - TOWER_HEIGHT - 100  # Leave space at bottom
+# Room around the tower for the outline's jitter and glitch lines
+OUTLINE_MARGIN = 40
+
+# Floors (or bands of floors) that fit inside the tower, and their size
+FLOOR_SLOTS = 10
+FLOOR_HEIGHT = 40
+FLOOR_SPACING = 30
+FLOOR_PITCH = FLOOR_HEIGHT + FLOOR_SPACING
+# Most dividing lines drawn inside a band of floors
+MAX_BAND_SLABS = 6
+
+# Pre-rendered backgrounds and outlines each render worker keeps and rotates through
+LAYER_POOL_SIZE = 4
+
+# A tall tower is laid out on one virtual canvas of TALL_MARGIN + floors * FLOOR_PITCH
+# pixels and cut into strips of HEIGHT pixels, at most MAX_STRIPS of them
+MAX_STRIPS = 10
+TALL_MARGIN = TOWER_Y + FLOOR_SPACING + 100
+MAX_TALL_FLOORS = (MAX_STRIPS * HEIGHT - TALL_MARGIN) // FLOOR_PITCH
+# Height of each jagged segment of a tall tower's walls
+WALL_SEGMENT = 40
+
+# Per-process resources, filled in by preload()
+fonts = None
+backgrounds = []
+outlines = []
+layers_used = 0
+
+
+def load_fonts():
+    """Title, subtitle and floor fonts, loaded once per process"""
+    global fonts
+    if fonts is None:
+        # Try to load fonts, fall back to default if not available
+        try:
+            fonts = (ImageFont.truetype("arial.ttf", 60), ImageFont.truetype("arial.ttf", 30), ImageFont.truetype("arial.ttf", 20))
+        except IOError:
+            # Use default font if truetype fonts are not available
+            fonts = (ImageFont.load_default(),) * 3
+    return fonts
+
+
+def render_background():
+    """The fixed decoration behind the tower: random shapes and grid"""
+    image = Image.new('RGB', (WIDTH, HEIGHT), BG_COLOR)
+    draw = ImageDraw.Draw(image)
+    draw_breakcore_background(draw, WIDTH, HEIGHT, NEON_COLORS)
+    return image
+
+
+def draw_titles(draw, total_floors):
+    title_font, subtitle_font, _ = load_fonts()
+    draw_glitch_text(draw, WIDTH // 2, 80, "THE ETERNAL TOWER", title_font, NEON_COLORS)
+    draw_glitch_text(draw, WIDTH // 2, 130, f"{total_floors} FLOORS OF CHAOS", subtitle_font, NEON_COLORS)
+
+
+def render_outline():
+    """A transparent layer with a glitchy tower outline, to be pasted at (TOWER_X, TOWER_Y) minus the margin"""
+    size = (TOWER_WIDTH + 2 * OUTLINE_MARGIN, TOWER_HEIGHT + 2 * OUTLINE_MARGIN)
+    layer = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    draw_glitch_tower_outline(draw, OUTLINE_MARGIN, OUTLINE_MARGIN, TOWER_WIDTH, TOWER_HEIGHT, NEON_COLORS)
+    return layer
+
+
+def preload():
+    """Load fonts and build this process's layer pools; used as a render worker initializer"""
+    load_fonts()
+    while len(backgrounds) < LAYER_POOL_SIZE:
+        backgrounds.append(render_background())
+    while len(outlines) < LAYER_POOL_SIZE:
+        outlines.append(render_outline())
+
+
+def base_image(height=HEIGHT, outline=True):
+    """A fresh canvas with a pooled background and outline composited on it.
+
+    Backgrounds and outlines rotate independently, so a pool of N of each
+    gives N * N different looking towers. Strips of a tall tower ask for no
+    outline (they draw their own) and may be shorter than HEIGHT.
+    """
+    global layers_used
+    preload()
+    background = backgrounds[layers_used % LAYER_POOL_SIZE]
+    outline_layer = outlines[(layers_used // LAYER_POOL_SIZE) % LAYER_POOL_SIZE]
+    layers_used += 1
+
+    image = background.copy() if height == HEIGHT else background.crop((0, 0, WIDTH, height))
+    if outline:
+        image.paste(outline_layer, (TOWER_X - OUTLINE_MARGIN, TOWER_Y - OUTLINE_MARGIN), outline_layer)
+    return image
+
+
+def layout_floors(levels, top_y):
+    """Glitchy geometry for each (label, floor_count) level, stacked FLOOR_PITCH apart downwards from top_y.
+
+    Worked out once per render, so a floor cut across two strips of a tall
+    tower lines up on both.
+    """
+    floors = []
+    for i, (floor_text, floor_count) in enumerate(levels):
+        # Calculate floor position with some random offset for glitch effect
+        x_offset = random.randint(-1, 1)
+        floor_y = top_y + i * FLOOR_PITCH + random.randint(-1, 1)
+        
+        # Draw floor with glitch effect
+        window_width = TOWER_WIDTH - 80 + random.randint(-20, 20)
+        window_x = TOWER_X + (TOWER_WIDTH - window_width) // 2 + x_offset
+        
+        # Pick a random neon color for this floor
+        floor_color = random.choice(NEON_COLORS)
+        
+        # Distorted floor rectangle
+        points = [
+            (window_x, floor_y),
+            (window_x + window_width, floor_y),
+            (window_x + window_width + random.randint(-10, 10), floor_y + FLOOR_HEIGHT),
+            (window_x + random.randint(-10, 10), floor_y + FLOOR_HEIGHT)
+        ]
+        
+        # Truncate long floor names
+        if len(floor_text) > 25:
+            floor_text = floor_text[:22] + "..."
+        floors.append((floor_y, window_x, window_width, points, floor_color, floor_text, floor_count))
+    return floors
+
+
+def draw_floor(draw, floor, font, top=0):
+    """Draw one floor from layout_floors onto a canvas whose first row is row `top` of the layout"""
+    floor_y, window_x, window_width, points, floor_color, floor_text, floor_count = floor
+    floor_y -= top
+    draw.polygon([(x, y - top) for x, y in points], fill=floor_color)
+    
+    # Add scanlines effect to floor
+    for y in range(int(floor_y), int(floor_y + FLOOR_HEIGHT), 2):
+        draw.line([(window_x, y), (window_x + window_width, y)], fill=(0, 0, 0), width=1)
+    
+    # Bands are split into a few thicker slabs so they read as a stack of floors
+    slabs = min(floor_count, MAX_BAND_SLABS)
+    for slab in range(1, slabs):
+        y = floor_y + slab * FLOOR_HEIGHT / slabs
+        draw.line([(window_x, y), (window_x + window_width, y)], fill=(0, 0, 0), width=3)
+    
+    # Draw text with small offsets for glitch effect
+    text_y = floor_y + FLOOR_HEIGHT // 2
+    draw.text((window_x + window_width // 2 + 2, text_y - 1), floor_text, fill=(0, 0, 0), font=font, anchor="mm")
+    draw.text((window_x + window_width // 2 - 2, text_y + 1), floor_text, fill=(255, 255, 255), font=font, anchor="mm")
+    draw.text((window_x + window_width // 2, text_y), floor_text, fill=(255, 255, 255), font=font, anchor="mm")
+
+
+def render_tower_image(levels, total_floors, effects=(), preset=DEFAULT_PRESET, max_bytes=None):
+    """Creates a breakcore-themed tower image and returns it as an EncodedImage.
+
+    `levels` are (label, floor_count) pairs from the top of the tower down, at
+    most FLOOR_SLOTS of them: single floors when zoomed in, bands summarizing
+    a range of floors when zoomed out. `effects` names the EFFECT_STAGES to
+    post-process the image with, and preset/max_bytes go to encode_image.
+
+    Runs in a render worker process, so it only takes and returns picklable values.
+    """
+    floor_font = load_fonts()[2]
+
+    # Background and outline come pre-rendered; only the titles and floors are drawn per request
+    image = base_image()
+    draw = ImageDraw.Draw(image)
+    draw_titles(draw, total_floors)
+    
+    # Floors are stacked up from just above the entrance
+    levels = levels[:FLOOR_SLOTS]
+    entrance_y = HEIGHT - 130
+    for floor in layout_floors(levels, entrance_y - len(levels) * FLOOR_PITCH):
+        draw_floor(draw, floor, floor_font)
+    
+    if effects:
+        image = apply_breakcore_effects(image, effects)
+    
+    # Encode for Discord upload
+    return encode_image(image, preset, max_bytes)
+
+
+def tall_height(floor_count):
+    """Height of the virtual canvas a tall tower of floor_count floors is laid out on"""
+    return TALL_MARGIN + floor_count * FLOOR_PITCH
+
+
+def tall_strip_count(floor_count):
+    return -(-tall_height(floor_count) // HEIGHT)
+
+
+def render_tower_strips(levels, total_floors, effects=(), preset=DEFAULT_PRESET, max_bytes=None):
+    """Render one tall tower of every level (up to MAX_TALL_FLOORS) as strips of HEIGHT pixels, top first.
+
+    The whole tower is laid out once on a virtual canvas, titles at the top
+    and one continuous outline around every floor, and cut into consecutive
+    strips. Only one strip is drawn and encoded at a time, so memory stays at
+    a single canvas however tall the tower is.
+    """
+    floor_font = load_fonts()[2]
+    levels = levels[:MAX_TALL_FLOORS]
+    height = tall_height(len(levels))
+    tower_top = TOWER_Y
+    tower_bottom = height - 100
+    floors = layout_floors(levels, tower_top + FLOOR_SPACING)
+    # Every strip redraws the outline from the same seed, so its pieces join up
+    outline_seed = random.random()
+    
+    images = []
+    for top in range(0, height, HEIGHT):
+        strip_height = min(HEIGHT, height - top)
+        image = base_image(strip_height, outline=False)
+        draw = ImageDraw.Draw(image)
+        if top == 0:
+            draw_titles(draw, total_floors)
+        draw_glitch_tower_outline(
+            draw, TOWER_X, tower_top - top, TOWER_WIDTH, tower_bottom - tower_top, NEON_COLORS,
+            segments=(tower_bottom - tower_top) // WALL_SEGMENT, glitch_lines=len(levels), rng=random.Random(outline_seed),
+        )
+        for floor in floors:
+            if floor[0] + FLOOR_HEIGHT + 10 > top and floor[0] - 10 < top + strip_height:
+                draw_floor(draw, floor, floor_font, top)
+        
+        if effects:
+            image = apply_breakcore_effects(image, effects)
+        images.append(encode_image(image, preset, max_bytes))
+        # Let this strip go before the next one is allocated
+        del image, draw
+    return images
+
+
+def draw_breakcore_background(draw, width, height, colors):
+    """Draw a chaotic breakcore-style background"""
+    # Draw random geometric shapes
+    for _ in range(50):
+        shape = random.choice(['line', 'rect', 'circle', 'triangle'])
+        color = random.choice(colors)
+        x1 = random.randint(0, width)
+        y1 = random.randint(0, height)
+        
+        if shape == 'line':
+            x2 = random.randint(0, width)
+            y2 = random.randint(0, height)
+            draw.line([(x1, y1), (x2, y2)], fill=color, width=random.randint(1, 5))
+        
+        elif shape == 'rect':
+            w = random.randint(20, 100)
+            h = random.randint(20, 100)
+            draw.rectangle([(x1, y1), (x1 + w, y1 + h)], outline=color, width=2)
+        
+        elif shape == 'circle':
+            r = random.randint(10, 50)
+            draw.ellipse([(x1 - r, y1 - r), (x1 + r, y1 + r)], outline=color, width=2)
+        
+        elif shape == 'triangle':
+            x2 = x1 + random.randint(-100, 100)
+            y2 = y1 + random.randint(-100, 100)
+            x3 = x1 + random.randint(-100, 100)
+            y3 = y1 + random.randint(-100, 100)
+            draw.polygon([(x1, y1), (x2, y2), (x3, y3)], outline=color, width=2)
+    
+    # Draw grid patterns
+    grid_spacing = random.randint(20, 40)
+    for x in range(0, width, grid_spacing):
+        opacity = random.randint(50, 150)
+        color = (*random.choice(colors)[:3], opacity)
+        draw.line([(x, 0), (x, height)], fill=color, width=1)
+    
+    for y in range(0, height, grid_spacing):
+        opacity = random.randint(50, 150)
+        color = (*random.choice(colors)[:3], opacity)
+        draw.line([(0, y), (width, y)], fill=color, width=1)
+
+
+def draw_glitch_text(draw, x, y, text, font, colors):
+    """Draw text with a glitchy effect"""
+    # Draw multiple layers with small offsets
+    for i in range(3):
+        offset_x = random.randint(-1, 0)
+        offset_y = random.randint(-1, 0)
+        color = random.choice(colors)
+        draw.text((x + offset_x, y + offset_y), text, fill=color, font=font, anchor="mm")
+    
+    # Draw main text on top
+    draw.text((x, y), text, fill=(255, 255, 255), font=font, anchor="mm")
+
+
+def draw_glitch_tower_outline(draw, x, y, width, height, colors, segments=20, glitch_lines=10, rng=random):
+    """Draw a glitchy tower outline, with its randomness taken from `rng`"""
+    # Base tower shape with jagged edges
+    points = []
+    segment_height = height / segments
+    
+    for i in range(segments + 1):
+        y_pos = y + i * segment_height
+        left_jitter = rng.randint(-15, 15) if i > 0 and i < segments else 0
+        right_jitter = rng.randint(-15, 15) if i > 0 and i < segments else 0
+        
+        points.append((x + left_jitter, y_pos))
+        
+    for i in range(segments, -1, -1):
+        y_pos = y + i * segment_height
+        right_jitter = rng.randint(-15, 15) if i > 0 and i < segments else 0
+        
+        points.append((x + width + right_jitter, y_pos))
+        
+    # Draw the tower outline multiple times with different colors
+    for i in range(3):
+        # Create a slightly distorted copy of the points
+        distorted_points = [(p[0] + rng.randint(-5, 5), p[1] + rng.randint(-5, 5)) for p in points]
+        draw.polygon(distorted_points, outline=rng.choice(colors), fill=None, width=2)
+    
+    # Draw the main outline
+    draw.polygon(points, outline=(255, 255, 255), fill=None, width=3)
+    
+    # Add some random horizontal glitch lines across the tower
+    for _ in range(glitch_lines):
+        y_pos = rng.randint(y, y + height)
+        color = rng.choice(colors)
+        line_width = rng.randint(2, 6)
+        draw.line([(x - 20, y_pos), (x + width + 20, y_pos)], fill=color, width=line_width)
+
+
+def shift_channels(pixels, rng):
+    """Offset the red and blue channels by up to 10px, wrapping around the edges"""
+    for channel in (0, 2):
+        shift = tuple(rng.integers(-10, 11, 2))
+        pixels[..., channel] = np.roll(pixels[..., channel], shift, axis=(0, 1))
+
+
+def add_noise_blocks(pixels, rng, count=50):
+    """Paint `count` small solid blocks of random color at random positions"""
+    height, width, _ = pixels.shape
+    xs = rng.integers(0, width, count)
+    ys = rng.integers(0, height, count)
+    block_widths = rng.integers(5, 21, count)
+    block_heights = rng.integers(1, 6, count)
+    colors = rng.integers(0, 256, (count, 3), dtype=np.uint8)
+
+    # Lay every block out on a 5x20 grid of offsets and mask each down to its own size
+    dy, dx = np.mgrid[0:5, 0:20]
+    mask = (dy < block_heights[:, None, None]) & (dx < block_widths[:, None, None])
+    rows = (ys[:, None, None] + dy)[mask]
+    cols = (xs[:, None, None] + dx)[mask]
+    blocks = np.broadcast_to(np.arange(count)[:, None, None], mask.shape)[mask]
+    inside = (rows < height) & (cols < width)
+    pixels[rows[inside], cols[inside]] = colors[blocks[inside]]
+
+
+def add_scanlines(pixels, rng):
+    """Black out every fourth row"""
+    pixels[::4] = 0
+
+
+def enhance_contrast(pixels, rng, factor=1.5):
+    """Same as ImageEnhance.Contrast: push pixels away from the mean grey level"""
+    # Summing down the rows first is much faster than reducing the whole image at once
+    red, green, blue = pixels.sum(axis=0, dtype=np.uint32).sum(axis=0) / (pixels.shape[0] * pixels.shape[1])
+    mean = int(red * 0.299 + green * 0.587 + blue * 0.114 + 0.5)
+    lut = np.clip(mean + (np.arange(256) - mean) * factor + 0.5, 0, 255).astype(np.uint16)
+
+    flat = pixels.reshape(-1)
+    if flat.size % 2:
+        pixels[...] = lut[pixels]
+        return
+    # Look bytes up in pairs through a 65536 entry table, half as many lookups as a plain LUT
+    index = np.arange(65536)
+    pair_lut = lut[index & 0xFF] | (lut[index >> 8] << 8)
+    pairs = flat.view(np.uint16)
+    np.take(pair_lut, pairs, out=pairs, mode="clip")
+
+
+# Post-processing stages for !seetower, applied in this order
+EFFECT_STAGES = {
+    "shift": shift_channels,
+    "noise": add_noise_blocks,
+    "scanlines": add_scanlines,
+    "contrast": enhance_contrast,
+}
+
+
+def apply_breakcore_effects(image, stages=tuple(EFFECT_STAGES)):
+    """Apply post-processing effects to create a breakcore aesthetic.
+
+    Every stage works in place on one NumPy copy of the image, so the whole
+    chain costs a few milliseconds on an 800x1200 tower.
+    """
+    pixels = np.array(image if image.mode == 'RGB' else image.convert('RGB'))
+    rng = np.random.default_rng()
+    for name, stage in EFFECT_STAGES.items():
+        if name in stages:
+            stage(pixels, rng)
+    return Image.fromarray(pixels)
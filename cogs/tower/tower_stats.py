@@ -0,0 +1,47 @@
+import heapq
+
+
+class TowerStats:
+    """Tower totals kept up to date as floors are added.
+
+    Loaded once from tower.db (the per-contributor counts come from the small
+    tower_contributors table, not from scanning every floor) and then updated
+    by record_floor, so !towerstats, !tower and !seetower never have to count
+    or aggregate the floors table.
+    """
+
+    def __init__(self):
+        self.total_floors = 0
+        self.highest_floor = 0
+        self.first_floor = None   # (floor_number, floor_name, added_by_name)
+        self.newest_floor = None  # (floor_number, floor_name, added_by_name)
+        self.contributors = {}    # added_by_id -> [added_by_name, floor_count]
+
+    async def load(self, db):
+        rows = await db.query("SELECT added_by_id, added_by_name, floor_count FROM tower_contributors")
+        self.contributors = {added_by_id: [name, count] for added_by_id, name, count in rows}
+        self.total_floors = sum(count for _, count in self.contributors.values())
+        self.first_floor = await db.query_one("SELECT floor_number, floor_name, added_by_name FROM tower_floors ORDER BY floor_number ASC LIMIT 1")
+        self.newest_floor = await db.query_one("SELECT floor_number, floor_name, added_by_name FROM tower_floors ORDER BY floor_number DESC LIMIT 1")
+        self.highest_floor = self.newest_floor[0] if self.newest_floor else 0
+
+    def record_floor(self, floor_number, floor_name, added_by_id, added_by_name):
+        """Account for a floor that has just been committed"""
+        floor = (floor_number, floor_name, added_by_name)
+        self.total_floors += 1
+        self.highest_floor = max(self.highest_floor, floor_number)
+        self.newest_floor = floor
+        if self.first_floor is None:
+            self.first_floor = floor
+
+        contributor = self.contributors.setdefault(added_by_id, [added_by_name, 0])
+        contributor[0] = added_by_name
+        contributor[1] += 1
+
+    def top_contributors(self, count=5):
+        """The `count` users with the most floors as (name, floor_count) pairs"""
+        return heapq.nlargest(count, (tuple(value) for value in self.contributors.values()), key=lambda value: value[1])
+
+
+# Shared by the Tower and TowerVisualization cogs
+tower_stats = TowerStats()
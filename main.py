@@ -1,6 +1,8 @@
 import discord
 from discord.ext import commands
 import fortune as fortune_module
+from cogs.paginator.paginator import Paginator
+from cogs.settings.settings import Settings
 from cogs.tower.tower import Tower
 from cogs.tower.tower_viz import TowerVisualization
 from cogs.spotify.spotify import setup as setup_spotify
@@ -8,6 +10,7 @@ from cogs.eight_ball.eight_ball import EightBall
 from cogs.points_items.points_items import PointsItemsCog
 from cogs.autoresponses.autoresponses import AutoResponses
 from cogs.reminders.reminders import Reminders
+from utils.outbound import outbound
 import os
 from dotenv import load_dotenv
 
@@ -24,6 +27,8 @@ bot = commands.Bot(command_prefix=PREFIX, intents=discord.Intents.all(), help_co
 @bot.event
 async def on_ready():
     print(f"Bot connected as {bot.user}")
+    await bot.add_cog(Paginator(bot))
+    await bot.add_cog(Settings(bot))
     await bot.add_cog(Tower(bot))
     await bot.add_cog(TowerVisualization(bot))
     await bot.add_cog(EightBall(bot))
@@ -38,6 +43,17 @@ async def fortune(ctx):
     fortune_text = fortune_module.fortune()
     await ctx.send(fortune_text)
 
+@bot.command()
+async def queuestats(ctx):
+    """Shows how backed up the outbound message queue is"""
+    stats = outbound.stats()
+    deepest = f"<#{stats['deepest'][0]}> ({stats['deepest'][1]} queued)" if stats["deepest"] else "none"
+    await ctx.send(
+        f"**Outbound queue:** {stats['queued']} messages waiting across {stats['channels']} channels\n"
+        f"Busiest channel: {deepest}\n"
+        f"Sent: {stats['sent']} • Edits merged: {stats['merged']} • Dropped: {stats['dropped']}"
+    )
+
 @bot.command()
 async def help(ctx):
     """Displays a list of available commands"""
@@ -47,18 +63,25 @@ async def help(ctx):
         "!addpoints @user <amount> - Adds points to a user\n"
         "!removepoints @user <amount> - Removes points from a user\n"
         "!giveitem @user <quantity> <item> - Gives an item to a user\n"
-        "!ranking - Displays the top 10 users with the most points and a chart\n"
+        "!bulkaddpoints / !bulkremovepoints @user @role ... <amount> - Adds or removes points for many users at once\n"
+        "!bulkgiveitem @user @role ... <quantity> <item> - Gives an item to many users at once\n"
+        "!ranking [count] - Displays the top users (10 by default) with the most points and a chart\n"
+        "!rank [@user] - Shows where a user (or yourself) stands on the leaderboard\n"
         "!8ball <question> - Ask a question, and the ball shall answer\n"
         "!tower - See what floors the tower has\n"
         "!toweradd <Floor Name> | <Floor Description> - Add a floor to the tower\n"
         "!towerinfo <Floor number> - Get details about a floor\n"
         "!towerstats - Get tower statistics\n"
-        "!seetower - GET A GLIMPSE AT THE TOWER OF HORROR\n"
+        "!towersearch <terms> - Search the tower for floors by name, description or builder\n"
+        "!seetower [floors] [tall] [glitch] - GET A GLIMPSE AT THE TOWER OF HORROR\n"
         "!playlist - Check out the official Magma Sphere Spotify playlist\n"
-        "!addsong <query> - Add a song to the Spotify playlist\n"
+        "!addsong <query or link> - Add a song (or a whole album/playlist link) to the Spotify playlist\n"
+        "!spotifystats - Shows how often Spotify lookups are served from cache and how songs are batched\n"
         "!remindme <time> <message> - Set a reminder (e.g., !remindme 1h30m Check the oven)\n"
         "!reminders - List all your active reminders\n"
-        "!cancelreminder <id> - Cancel a reminder by its ID"
+        "!cancelreminder <id> - Cancel a reminder by its ID\n"
+        "!queuestats - Shows how many outgoing messages are waiting to be sent\n"
+        "!imageformat [format] - Shows or sets (Manage Server) how this server's images are encoded"
        )
     
     # Split help message into chunks if it exceeds Discord's message length limit
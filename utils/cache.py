@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Dict-like cache that keeps at most `maxsize` entries, evicting the least recently used"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after they were stored.
+
+    fetch() is the async front end for API lookups: a miss awaits the given
+    factory and caches its result, and concurrent misses for the same key
+    share that one in-flight call instead of each making their own.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expiry, value)
+        self.pending = {}  # key -> task fetching it
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # misses that joined a fetch already in flight
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    async def fetch(self, key, factory):
+        """Cached value for key, or the result of awaiting factory() (which is then cached)"""
+        task = self.pending.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            task = asyncio.ensure_future(factory())
+            self.pending[key] = task
+            task.add_done_callback(partial(self._fetched, key))
+        # Shielded so one caller giving up doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _fetched(self, key, task):
+        del self.pending[key]
+        # Failures aren't cached, the next lookup tries again
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, task.result())
+
+    def stats(self):
+        """Current size and lifetime counters"""
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+
+class ImageCache:
+    """Content-addressed cache for rendered images.
+
+    Entries are keyed by a hash of everything that went into the image (see
+    key()), so an unchanged leaderboard maps to the same entry and never needs
+    re-rendering. The memory tier is an LRU capped by total bytes; if a
+    directory is given, entries are also written there as files so they
+    survive restarts, with the oldest removed once max_disk_bytes is exceeded.
+    Only the bookkeeping happens on the event loop, file reads, writes and
+    removals run in the default executor.
+    """
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> bytes
+        self.size = 0
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_entries = OrderedDict()  # key -> file size, oldest first
+        self.disk_size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts):
+        """sha256 of the (JSON serialisable) data an image is rendered from"""
+        encoded = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".img")
+
+    async def load(self):
+        """Index the files already in the cache directory, oldest first"""
+        if self.directory is None:
+            return
+        files = await asyncio.get_running_loop().run_in_executor(None, self._scan)
+        for key, size in files:
+            self.disk_entries[key] = size
+            self.disk_size += size
+
+    def _scan(self):
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".img"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        return [(key, size) for _, key, size in sorted(files)]
+
+    async def get(self, key):
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if key in self.disk_entries:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+            except OSError:
+                if key in self.disk_entries:
+                    self.disk_size -= self.disk_entries.pop(key)
+            else:
+                if key in self.disk_entries:
+                    self.disk_entries.move_to_end(key)
+                self._remember(key, data)
+                self.hits += 1
+                return data
+
+        self.misses += 1
+        return None
+
+    def _read(self, key):
+        with open(self._path(key), "rb") as f:
+            data = f.read()
+        os.utime(self._path(key))
+        return data
+
+    async def put(self, key, data):
+        self._remember(key, data)
+        if self.directory is None or key in self.disk_entries:
+            return
+
+        # Account for the file up front so concurrent puts agree on what to evict
+        self.disk_entries[key] = len(data)
+        self.disk_size += len(data)
+        evicted = []
+        while self.max_disk_bytes is not None and self.disk_size > self.max_disk_bytes and len(self.disk_entries) > 1:
+            old_key, old_size = self.disk_entries.popitem(last=False)
+            self.disk_size -= old_size
+            evicted.append(old_key)
+
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, key, data, evicted)
+        except OSError as e:
+            print(f"Warning: could not write {self._path(key)} ({e})")
+            if key in self.disk_entries:
+                self.disk_size -= self.disk_entries.pop(key)
+
+    def _write(self, key, data, evicted):
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+        with open(self._path(key), "wb") as f:
+            f.write(data)
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
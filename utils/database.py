@@ -0,0 +1,221 @@
+import asyncio
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import os
+from utils.migrations import apply_migrations
+
+# Result of a write statement: rows returned (for RETURNING clauses), last inserted rowid and affected rows
+ExecuteResult = namedtuple("ExecuteResult", ["rows", "lastrowid", "rowcount"])
+
+# One Database per file, shared by every cog that uses it
+_databases = {}
+
+
+class Database:
+    """Async access to a single SQLite file.
+
+    All writes go through one writer thread and reads are spread over a small
+    pool of reader threads. Every thread keeps its own connection and the file
+    runs in WAL mode, so readers never block the writer (or each other) and no
+    sqlite call ever runs on the event loop. `synchronous` is the file's
+    PRAGMA synchronous: NORMAL skips the fsync on each WAL commit, FULL makes
+    every commit durable (and is what makes group commit pay off).
+    """
+
+    def __init__(self, path, readers=4, synchronous="NORMAL"):
+        self.path = path
+        self.synchronous = synchronous
+        name = os.path.splitext(os.path.basename(path))[0]
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"db-{name}-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix=f"db-{name}-reader")
+        self._batch = []
+        self._batch_task = None
+
+    def _connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None leaves transaction control to us (see _write).
+            # Connections are only ever used by their own thread; the check is
+            # disabled so close() can tear them down from the caller's thread.
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _run(self, executor, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(fn, *args))
+
+    # --- Worker-thread helpers ---
+
+    def _read(self, sql, params, one):
+        cursor = self._connection().execute(sql, params)
+        try:
+            return cursor.fetchone() if one else cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _write(self, fn, *args):
+        """Run fn(conn, *args) inside a single write transaction"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    @staticmethod
+    def _execute(conn, sql, params):
+        cursor = conn.execute(sql, params)
+        try:
+            return ExecuteResult(cursor.fetchall(), cursor.lastrowid, cursor.rowcount)
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _executemany(conn, sql, seq_of_params):
+        cursor = conn.executemany(sql, seq_of_params)
+        try:
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _write_batch(conn, batch):
+        """Run every (fn, args) in the batch, each in its own savepoint.
+
+        A failing entry is rolled back on its own and its exception returned in
+        place of a result, so it does not take the rest of the batch with it.
+        """
+        results = []
+        for fn, args in batch:
+            conn.execute("SAVEPOINT batch_entry")
+            try:
+                results.append(fn(conn, *args))
+            except Exception as e:
+                conn.execute("ROLLBACK TO batch_entry")
+                results.append(e)
+            conn.execute("RELEASE batch_entry")
+        return results
+
+    def _executescript(self, script):
+        self._connection().executescript(script)
+
+    def _migrate(self, migrations):
+        return apply_migrations(self._connection(), migrations)
+
+    # --- Public API ---
+
+    async def query(self, sql, params=()):
+        """Run a read query and return all rows"""
+        return await self._run(self._readers, self._read, sql, params, False)
+
+    async def query_one(self, sql, params=()):
+        """Run a read query and return the first row (or None)"""
+        return await self._run(self._readers, self._read, sql, params, True)
+
+    async def execute(self, sql, params=()):
+        """Run a single write statement in its own transaction"""
+        return await self._run(self._writer, self._write, self._execute, sql, params)
+
+    async def executemany(self, sql, seq_of_params):
+        """Run a write statement for every parameter set in one transaction"""
+        return await self._run(self._writer, self._write, self._executemany, sql, list(seq_of_params))
+
+    async def executescript(self, script):
+        """Run a multi-statement script (e.g. schema creation) on the writer"""
+        return await self._run(self._writer, self._executescript, script)
+
+    async def transaction(self, fn, *args):
+        """Run fn(conn, *args) on the writer thread inside one transaction.
+
+        fn is plain blocking code that receives a sqlite3 connection; it is
+        committed if it returns and rolled back if it raises.
+        """
+        return await self._run(self._writer, self._write, fn, *args)
+
+    async def execute_batched(self, sql, params=()):
+        """Like execute(), but group-committed with other writes (see run_batched)"""
+        return await self.run_batched(self._execute, sql, params)
+
+    async def run_batched(self, fn, *args):
+        """Like transaction(), but shares one commit with other batched writes.
+
+        While one batch is being committed, newly arriving writes queue up and
+        are applied together in the next transaction, so a burst of commands
+        costs a handful of commits instead of one each, without adding latency
+        when the writer is idle. Each caller is resumed only after the batch
+        containing its write has been committed.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append((fn, args, future))
+        if self._batch_task is None:
+            self._batch_task = loop.create_task(self._flush_batches())
+        return await future
+
+    async def _flush_batches(self):
+        try:
+            # Let writes issued in the same event loop iteration join the first batch
+            await asyncio.sleep(0)
+            while self._batch:
+                batch, self._batch = self._batch, []
+                try:
+                    results = await self._run(self._writer, self._write, self._write_batch, [(fn, args) for fn, args, _ in batch])
+                except Exception as e:
+                    # The commit itself failed, so none of the writes landed
+                    results = [e] * len(batch)
+
+                for (_, _, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._batch_task = None
+
+    async def migrate(self, migrations):
+        """Apply any pending schema migrations (see utils.migrations)"""
+        applied = await self._run(self._writer, self._migrate, migrations)
+        if applied:
+            print(f"Migrated {self.path} to schema version {applied[-1]}")
+        return applied
+
+    def close(self):
+        """Wait for pending work and close every connection"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def get_database(path, synchronous="NORMAL"):
+    """Return the shared Database for a file, creating it on first use"""
+    key = os.path.abspath(path)
+    if key not in _databases:
+        _databases[key] = Database(path, synchronous=synchronous)
+    return _databases[key]
+
+
+def close_all():
+    """Close every open database"""
+    for db in _databases.values():
+        db.close()
+    _databases.clear()
@@ -0,0 +1,73 @@
+from collections import namedtuple
+from PIL import Image
+import io
+import time
+
+EncodingPreset = namedtuple("EncodingPreset", ["format", "options", "quantize", "description"])
+
+# Measured on an 800x1200 tower: png ~35-50 KB in ~50-80 ms, palette ~35 KB in ~35 ms,
+# webp ~30 KB in ~45 ms. Lossy WebP is only smaller for photo-like images.
+PRESETS = {
+    "png": EncodingPreset("PNG", {"compress_level": 6}, False, "Lossless PNG (default)"),
+    "png-fast": EncodingPreset("PNG", {"compress_level": 1}, False, "Lossless PNG, quickest to encode but about twice the size"),
+    "png-small": EncodingPreset("PNG", {"compress_level": 9}, False, "Lossless PNG, a little smaller but several times slower"),
+    "palette": EncodingPreset("PNG", {"compress_level": 6}, True, "256 color PNG, small and quick, slight banding on glitch effects"),
+    "webp": EncodingPreset("WEBP", {"lossless": True, "method": 0}, False, "Lossless WebP, usually the smallest"),
+    "webp-lossy": EncodingPreset("WEBP", {"quality": 60, "method": 4}, False, "Lossy WebP, for when nothing else fits"),
+}
+DEFAULT_PRESET = "png"
+# Tried in order when an image does not fit its byte budget
+FALLBACK_PRESETS = ["palette", "webp", "webp-lossy"]
+# Discord's upload limit outside boosted servers
+DEFAULT_UPLOAD_LIMIT = 10 * 1024 * 1024
+
+EXTENSIONS = {"PNG": "png", "WEBP": "webp"}
+
+
+class EncodedImage(namedtuple("EncodedImage", ["data", "preset", "encode_ms"])):
+    __slots__ = ()
+
+    @property
+    def extension(self):
+        return EXTENSIONS[PRESETS[self.preset].format]
+
+    def summary(self):
+        """Size and cost of the encoding, for footers and messages"""
+        return f"{self.preset} • {len(self.data) / 1024:.0f} KB • encoded in {self.encode_ms:.0f} ms"
+
+
+def image_extension(data):
+    """File extension for encoded image bytes, e.g. ones coming back from a cache"""
+    return "webp" if data[:4] == b"RIFF" else "png"
+
+
+def upload_limit(guild):
+    """Largest file the bot can upload in a guild (or in DMs when guild is None)"""
+    return guild.filesize_limit if guild is not None else DEFAULT_UPLOAD_LIMIT
+
+
+def encode_image(image, preset=DEFAULT_PRESET, max_bytes=None):
+    """Encode a PIL image with a preset from PRESETS.
+
+    If the result is bigger than max_bytes the FALLBACK_PRESETS are tried in
+    turn, and the first that fits (or else the smallest) is returned.
+    encode_ms counts the time spent on every attempt.
+    """
+    if preset not in PRESETS:
+        preset = DEFAULT_PRESET
+    candidates = [preset] + [fallback for fallback in FALLBACK_PRESETS if fallback != preset]
+
+    start = time.perf_counter()
+    smallest = None
+    for name in candidates:
+        settings = PRESETS[name]
+        source = image.quantize(256, method=Image.Quantize.FASTOCTREE) if settings.quantize else image
+        buffer = io.BytesIO()
+        source.save(buffer, format=settings.format, **settings.options)
+        data = buffer.getvalue()
+        if smallest is None or len(data) < len(smallest[0]):
+            smallest = (data, name)
+        if max_bytes is None or len(data) <= max_bytes:
+            break
+
+    return EncodedImage(smallest[0], smallest[1], (time.perf_counter() - start) * 1000)
@@ -0,0 +1,82 @@
+import time
+
+# Every database records the migrations applied to it in this table
+VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    applied_at INTEGER NOT NULL
+)
+"""
+
+
+def current_version(conn):
+    """Return the newest migration applied to the database (0 for a fresh file)"""
+    conn.execute(VERSION_TABLE)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+
+def apply_migrations(conn, migrations):
+    """Bring a database up to date, one transaction per migration.
+
+    `migrations` is a list of (version, step) pairs in ascending order, where
+    step is either a list of SQL statements or a callable taking the
+    connection (for data conversions that need Python). Migrations already
+    recorded in schema_version are skipped, so existing .db files are upgraded
+    in place. Returns the versions that were applied.
+    """
+    current = current_version(conn)
+    applied = []
+    for version, step in migrations:
+        if version <= current:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(statement)
+            conn.execute("INSERT INTO schema_version (version, applied_at) VALUES (?, ?)", (version, int(time.time())))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        applied.append(version)
+    return applied
+
+
+def rebuild_table(conn, table, create_sql, columns, convert=None):
+    """Recreate a table with a new definition, copying (and optionally converting) every row.
+
+    SQLite cannot change a column's type in place, so the old table is renamed,
+    the new one created from create_sql and the rows copied across. `convert`
+    receives each row as a tuple in `columns` order and returns the new row.
+    An AUTOINCREMENT counter is carried over, so ids of deleted rows are never
+    handed out again.
+    """
+    sequence = table_sequence(conn, table)
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute(create_sql)
+    column_list = ", ".join(columns)
+    placeholders = ", ".join("?" * len(columns))
+    rows = conn.execute(f"SELECT {column_list} FROM {table}_old")
+    if convert:
+        rows = map(convert, rows)
+    conn.executemany(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows)
+    conn.execute(f"DROP TABLE {table}_old")
+    if sequence is not None:
+        # The copy only advanced the new table's counter to max(id)
+        if table_sequence(conn, table) is None:
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, sequence))
+        else:
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence, table))
+
+
+def table_sequence(conn, table):
+    """The AUTOINCREMENT counter of a table, or None if it has none (yet)"""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'").fetchone()
+    if exists is None:
+        return None
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else None
@@ -0,0 +1,144 @@
+import asyncio
+from collections import deque
+from utils.ratelimit import TokenBucket
+
+# Discord allows 5 messages per 5 seconds in a channel and 50 requests per second overall
+CHANNEL_BURST = 5
+CHANNEL_RATE = 1.0
+GLOBAL_BURST = 50
+GLOBAL_RATE = 50.0
+
+# Droppable messages (e.g. autoresponses) are discarded once a channel has this many queued
+MAX_DROPPABLE_DEPTH = 10
+# Idle channels are remembered (with their bucket) until there are this many,
+# then the ones whose bucket has refilled completely are forgotten
+MAX_IDLE_CHANNELS = 1000
+
+
+class _Job:
+    __slots__ = ("kind", "target", "kwargs", "future")
+
+    def __init__(self, kind, target, kwargs, future):
+        self.kind = kind
+        self.target = target
+        self.kwargs = kwargs
+        self.future = future
+
+
+class _ChannelQueue:
+    def __init__(self):
+        self.jobs = deque()
+        self.edits = {}  # message id -> pending edit job, so repeated edits can be merged
+        self.bucket = TokenBucket(CHANNEL_BURST, CHANNEL_RATE)
+        self.worker = None
+
+
+class Outbound:
+    """Central dispatcher for outgoing messages.
+
+    Sends and edits are queued per channel and released at the pace Discord's
+    per-channel and global buckets allow, instead of every cog firing requests
+    directly and running into 429s. An edit to a message that already has an
+    edit waiting is merged into it, so only the latest state is sent.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.global_bucket = TokenBucket(GLOBAL_BURST, GLOBAL_RATE)
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def _queue(self, channel_id):
+        queue = self.channels.get(channel_id)
+        if queue is None:
+            if len(self.channels) >= MAX_IDLE_CHANNELS:
+                self._prune()
+            queue = self.channels[channel_id] = _ChannelQueue()
+        return queue
+
+    def _prune(self):
+        # A channel can only be forgotten once its bucket is full again, a new
+        # queue starts with a full bucket and would otherwise skip its pacing
+        for channel_id, queue in list(self.channels.items()):
+            if queue.worker is None and not queue.jobs and queue.bucket.delay(CHANNEL_BURST) == 0:
+                del self.channels[channel_id]
+
+    def _start(self, channel_id, queue):
+        if queue.worker is None:
+            queue.worker = asyncio.get_running_loop().create_task(self._drain(channel_id, queue))
+
+    async def send(self, channel, droppable=False, **kwargs):
+        """Queue channel.send(**kwargs) and return the sent message.
+
+        Droppable messages are skipped (returning None) when the channel is
+        already backed up, so that bursts of low-value messages do not delay
+        everything else.
+        """
+        queue = self._queue(channel.id)
+        if droppable and len(queue.jobs) >= MAX_DROPPABLE_DEPTH:
+            self.dropped += 1
+            return None
+
+        job = _Job("send", channel, kwargs, asyncio.get_running_loop().create_future())
+        queue.jobs.append(job)
+        self._start(channel.id, queue)
+        return await asyncio.shield(job.future)
+
+    async def edit(self, message, **kwargs):
+        """Queue message.edit(**kwargs), merging it into an edit that is still waiting"""
+        queue = self._queue(message.channel.id)
+        job = queue.edits.get(message.id)
+        if job is not None:
+            job.kwargs.update(kwargs)
+            self.merged += 1
+        else:
+            job = _Job("edit", message, kwargs, asyncio.get_running_loop().create_future())
+            queue.edits[message.id] = job
+            queue.jobs.append(job)
+            self._start(message.channel.id, queue)
+        return await asyncio.shield(job.future)
+
+    async def _drain(self, channel_id, queue):
+        try:
+            while queue.jobs:
+                await queue.bucket.acquire()
+                await self.global_bucket.acquire()
+
+                job = queue.jobs.popleft()
+                if job.kind == "edit":
+                    queue.edits.pop(job.target.id, None)
+
+                try:
+                    if job.kind == "send":
+                        result = await job.target.send(**job.kwargs)
+                    else:
+                        result = await job.target.edit(**job.kwargs)
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    self.sent += 1
+                    if not job.future.done():
+                        job.future.set_result(result)
+        finally:
+            # The queue itself stays, so the channel's bucket keeps pacing whatever is sent next
+            queue.worker = None
+            if queue.jobs:
+                self._start(channel_id, queue)
+
+    def stats(self):
+        """Current queue depth and lifetime counters"""
+        depths = {channel_id: len(queue.jobs) for channel_id, queue in self.channels.items() if queue.jobs}
+        return {
+            "channels": len(depths),
+            "queued": sum(depths.values()),
+            "deepest": max(depths.items(), key=lambda item: item[1]) if depths else None,
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+        }
+
+
+# Shared by every cog
+outbound = Outbound()
@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+# Worker processes drawing images at the same time
+RENDER_WORKERS = 2
+# Jobs that may wait for a free worker before new ones are turned away
+MAX_QUEUED = 8
+# Seconds a command waits for its image before giving up
+RENDER_TIMEOUT = 30
+
+
+def _run_initializers(initializers):
+    for initializer in initializers:
+        initializer()
+
+
+def _ready():
+    return True
+
+
+class RenderQueueFull(Exception):
+    """Raised by RenderService.submit when MAX_QUEUED jobs are already waiting"""
+
+
+class RenderService:
+    """Runs image rendering in a pool of worker processes.
+
+    PIL drawing holds the GIL for most of its work, so even a thread pool would stall
+    gateway heartbeats and every other command while a big tower is drawn.
+    Jobs are module-level functions (they have to be picklable) that return
+    the encoded image as bytes.
+    """
+
+    def __init__(self, workers=RENDER_WORKERS, max_queued=MAX_QUEUED, timeout=RENDER_TIMEOUT):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.pool = None
+        self.slots = None
+        self.waiting = 0
+        self.initializers = []
+
+    def add_initializer(self, fn):
+        """Have every worker process run fn() when it starts, e.g. to preload fonts.
+
+        Must be a picklable module-level function, added before the pool starts.
+        """
+        self.initializers.append(fn)
+
+    def start(self):
+        """Start the worker processes (and their initializers) now instead of on the first job"""
+        if self.pool is not None:
+            return
+        # spawn, so workers don't inherit the database threads (and any locks they hold) by forking
+        self.pool = ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_run_initializers,
+            initargs=(tuple(self.initializers),),
+        )
+        self.slots = asyncio.Semaphore(self.workers)
+        for _ in range(self.workers):
+            self.pool.submit(_ready)
+
+    def _job_done(self, slots, future):
+        # A worker only frees up when its job really finishes, even if nobody is waiting for it anymore.
+        # The slot goes back to the semaphore it came from, which a restarted pool no longer uses
+        slots.release()
+        if not future.cancelled():
+            future.exception()
+
+    async def submit(self, fn, *args, on_queued=None):
+        """Run fn(*args) in a worker process and return its result.
+
+        When every worker is busy the job waits its turn, after awaiting
+        on_queued(position) if given. Raises RenderQueueFull if the queue is
+        already full and asyncio.TimeoutError if the job outlives the timeout.
+        """
+        self.start()
+        if self.slots.locked():
+            if self.waiting >= self.max_queued:
+                raise RenderQueueFull()
+            self.waiting += 1
+            try:
+                if on_queued is not None:
+                    await on_queued(self.waiting)
+                await self.slots.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self.slots.acquire()
+
+        pool, slots = self.pool, self.slots
+        try:
+            future = asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            slots.release()
+            self._restart(pool)
+            raise
+        future.add_done_callback(partial(self._job_done, slots))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+
+    def _restart(self, pool):
+        """Drop a pool whose worker died, the next job starts a fresh one"""
+        if self.pool is pool:
+            print("A render worker died, restarting the render pool")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def render(self, ctx, fn, *args):
+        """submit() on behalf of a command, telling the user about queueing and failures.
+
+        Returns the job's result, or None if the image could not be rendered.
+        """
+        async def on_queued(position):
+            await ctx.send(f"The renderer is busy, you are #{position} in queue.")
+
+        try:
+            return await self.submit(fn, *args, on_queued=on_queued)
+        except RenderQueueFull:
+            await ctx.send("The renderer is swamped right now, please try again in a minute.")
+        except asyncio.TimeoutError:
+            await ctx.send("Rendering took too long and was abandoned, please try again later.")
+        except Exception as e:
+            print(f"Rendering failed: {e}")
+            traceback.print_exc()
+            await ctx.send("Something went wrong while rendering that image, please try again later.")
+        return None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+
+# Shared by every cog that renders images
+render_service = RenderService()
@@ -0,0 +1,88 @@
+from PIL import Image, ImageDraw, ImageFont
+
+HEADER_COLOR = "#4CAF50"
+CELL_COLOR = "#f2f2f2"
+ALTERNATE_CELL_COLOR = "#e6e6e6"
+HEADER_BORDER_COLOR = "black"
+CELL_BORDER_COLOR = "gray"
+TEXT_COLOR = "black"
+BACKGROUND_COLOR = "white"
+
+CELL_PADDING_X = 14
+CELL_PADDING_Y = 8
+MARGIN = 20
+# Cells wider than this are cut short with an ellipsis
+MAX_CELL_WIDTH = 600
+# No glyph is narrower than ~4px, so longer text can be cut before it is measured
+MAX_CELL_CHARS = MAX_CELL_WIDTH // 4
+
+# (title, header, cell) fonts, loaded once per process
+fonts = None
+
+
+def load_fonts():
+    global fonts
+    if fonts is None:
+        try:
+            fonts = (ImageFont.truetype("arialbd.ttf", 22), ImageFont.truetype("arialbd.ttf", 18), ImageFont.truetype("arial.ttf", 16))
+        except IOError:
+            fonts = (ImageFont.load_default(22), ImageFont.load_default(18), ImageFont.load_default(16))
+    return fonts
+
+
+def fit_text(text, font, width):
+    """Cut text down (with an ellipsis) until it is at most `width` pixels wide"""
+    if font.getlength(text) <= width:
+        return text
+    # Binary search for the longest prefix that still fits
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if font.getlength(text[:middle] + "...") <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "..."
+
+
+def render_table(headers, rows, title=None):
+    """Draw a table with a green header row and alternating row colors, returned as a PIL image.
+
+    Columns are sized to their widest cell; every value is shown with str().
+    """
+    title_font, header_font, cell_font = load_fonts()
+    cells = [[str(value)[:MAX_CELL_CHARS] for value in row] for row in rows]
+
+    widths = []
+    for column, header in enumerate(headers):
+        width = header_font.getlength(header)
+        for row in cells:
+            width = max(width, cell_font.getlength(row[column]))
+        widths.append(int(min(width, MAX_CELL_WIDTH)) + 2 * CELL_PADDING_X)
+    cells = [[fit_text(value, cell_font, width - 2 * CELL_PADDING_X) for value, width in zip(row, widths)] for row in cells]
+
+    row_height = int(max(header_font.size, cell_font.size) * 1.2) + 2 * CELL_PADDING_Y
+    title_height = int(title_font.size * 1.2) + MARGIN if title else 0
+    table_width = sum(widths)
+    image = Image.new("RGB", (table_width + 2 * MARGIN, title_height + row_height * (len(cells) + 1) + 2 * MARGIN), BACKGROUND_COLOR)
+    draw = ImageDraw.Draw(image)
+
+    if title:
+        draw.text((image.width // 2, MARGIN + title_height // 2 - MARGIN // 2), title, fill=TEXT_COLOR, font=title_font, anchor="mm")
+
+    top = MARGIN + title_height
+    for row_index, row in enumerate([headers] + cells):
+        if row_index == 0:
+            fill, outline, font = HEADER_COLOR, HEADER_BORDER_COLOR, header_font
+        else:
+            fill = CELL_COLOR if row_index % 2 else ALTERNATE_CELL_COLOR
+            outline, font = CELL_BORDER_COLOR, cell_font
+
+        left = MARGIN
+        for value, width in zip(row, widths):
+            draw.rectangle([left, top, left + width, top + row_height], fill=fill, outline=outline)
+            draw.text((left + width / 2, top + row_height / 2), value, fill=TEXT_COLOR, font=font, anchor="mm")
+            left += width
+        top += row_height
+
+    return image